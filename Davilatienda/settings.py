@@ -31,7 +31,7 @@ ALLOWED_HOSTS = ['*']
 # ----------------------------
 AUTH_USER_MODEL = 'tienda.CustomUser'
 AUTHENTICATION_BACKENDS = [
-    'django.contrib.auth.backends.ModelBackend',
+    'tienda.backends.EmailBackend',
 ]
 
 # ----------------------------
@@ -121,6 +121,26 @@ DATABASES = {
 }
 
 
+# ----------------------------
+# Cache
+# ----------------------------
+# Por defecto en memoria del proceso; con REDIS_URL se comparte entre workers.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'davilatienda',
+    }
+}
+if os.environ.get('REDIS_URL'):
+    CACHES['default'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ['REDIS_URL'],
+    }
+
+# Contadores y bloqueos de login (tienda/limites.py); sin Redis quedan en memoria del proceso.
+LIMITES_REDIS_URL = os.environ.get('REDIS_URL')
+
+
 # ----------------------------
 # REST Framework & JWT
 # ----------------------------
@@ -131,11 +151,16 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
     ],
+    # Proxies delante de gunicorn (App Platform: 1). La IP del cliente es la que
+    # agregó el último de ellos en X-Forwarded-For; lo anterior lo manda el cliente.
+    'NUM_PROXIES': int(os.environ.get('NUM_PROXIES', 1)),
 }
 
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=60),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=7),
+    # Vuelve a leer permisos y token_version del usuario al refrescar (ver tienda/tokens.py).
+    "TOKEN_REFRESH_SERIALIZER": "tienda.serializers.CustomTokenRefreshSerializer",
 }
 
 # ----------------------------
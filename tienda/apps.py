@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class TiendaConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'tienda'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from .plantillas_correo import precompilar
+        precompilar()
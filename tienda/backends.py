@@ -0,0 +1,50 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.hashers import check_password, get_hasher, identify_hasher
+
+UserModel = get_user_model()
+
+
+class EmailBackend(ModelBackend):
+    """
+    ``ModelBackend`` sin la actualización implícita del hash.
+
+    ``AbstractBaseUser.check_password`` vuelve a hashear y guarda la contraseña
+    dentro de ``authenticate`` cuando cambió el hasher o sus iteraciones; aquí
+    solo se verifica, y quien llama decide si actualizar con ``hash_obsoleto``.
+    Así un login normal no escribe en la tabla de usuarios.
+    """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        try:
+            user = UserModel._default_manager.get_by_natural_key(username)
+        except UserModel.DoesNotExist:
+            # Mismo costo que con un usuario existente, para no revelar cuáles existen.
+            UserModel().set_password(password)
+            return None
+        if check_password(password, user.password) and self.user_can_authenticate(user):
+            return user
+        return None
+
+
+def hash_obsoleto(encoded):
+    """True si la contraseña guardada no usa el hasher/parámetros preferidos."""
+    preferido = get_hasher("default")
+    try:
+        hasher = identify_hasher(encoded)
+    except ValueError:
+        return False
+    return hasher.algorithm != preferido.algorithm or preferido.must_update(encoded)
+
+
+def actualizar_hash(user, password):
+    """Re-hashea y guarda solo la columna ``password`` si hace falta. Retorna True si escribió."""
+    if not hash_obsoleto(user.password):
+        return False
+    user.set_password(password)
+    user.save(update_fields=["password"])
+    return True
@@ -0,0 +1,188 @@
+"""
+Caché del catálogo.
+
+Las claves llevan una "versión del catálogo" que se incrementa cada vez que
+cambia un producto (ver ``signals.py``), así invalidar es O(1) y no hay que
+recorrer claves. El TTL acota lo desactualizado que puede quedar un worker
+cuando el backend de caché es local por proceso.
+"""
+import hashlib
+import json
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import IntegrityError, connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework.response import Response
+
+from .models import ClaveIdempotencia
+
+VERSION_KEY = "catalogo:version"
+CONTEO_TTL = 60 * 5
+RESPUESTA_TTL = 60 * 5
+
+
+def version_catalogo():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, 1, timeout=None)
+        version = cache.get(VERSION_KEY, 1)
+    return version
+
+
+def invalidar_catalogo():
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, 2, timeout=None)
+
+
+def clave_catalogo(prefijo, *partes):
+    """Clave versionada; ``partes`` debe ser serializable a JSON."""
+    digest = hashlib.md5(
+        json.dumps(partes, sort_keys=True, default=str).encode()
+    ).hexdigest()
+    return f"catalogo:{version_catalogo()}:{prefijo}:{digest}"
+
+
+def conteo_cacheado(queryset, filtros):
+    """``COUNT(*)`` del queryset, cacheado por la tupla normalizada de filtros."""
+    key = clave_catalogo("conteo", filtros)
+    total = cache.get(key)
+    if total is None:
+        total = queryset.count()
+        cache.set(key, total, CONTEO_TTL)
+    return total
+
+
+def estimar_filas(queryset):
+    """
+    Estimación de filas del planificador de PostgreSQL (``EXPLAIN``), sin
+    recorrer la tabla. Retorna None si la base no la ofrece.
+    """
+    if connections[queryset.db].vendor != "postgresql":
+        return None
+    plan = json.loads(queryset.explain(format="json"))
+    if isinstance(plan, list):
+        plan = plan[0]
+    return int(plan["Plan"]["Plan Rows"])
+
+
+def audiencia(user):
+    """
+    Las tres formas de precio que produce ProductoSerializer: staff ve ambos
+    precios, mayoreo solo el de mayoreo, y el resto (incluido anónimo) el unitario.
+    """
+    if not user or not user.is_authenticated:
+        return "publico"
+    if user.is_staff or user.is_superuser:
+        return "staff"
+    if getattr(user, "puede_ver_precios_mayoreo", False):
+        return "mayoreo"
+    return "publico"
+
+
+class RespuestaCacheadaMixin:
+    """
+    Cachea el ``GET`` de vistas públicas del catálogo por audiencia y
+    parámetros de la URL (no por usuario), de modo que todos los visitantes
+    de un mismo tipo comparten la respuesta.
+    """
+    cache_prefijo = None
+    cache_timeout = RESPUESTA_TTL
+
+    def get_cache_key(self, request, *args, **kwargs):
+        params = sorted((k, sorted(v)) for k, v in request.query_params.lists())
+        return clave_catalogo(
+            self.cache_prefijo or type(self).__name__,
+            audiencia(request.user),
+            request.get_host(),
+            params,
+            kwargs,
+        )
+
+    def get(self, request, *args, **kwargs):
+        key = self.get_cache_key(request, *args, **kwargs)
+        data = cache.get(key)
+        if data is not None:
+            return Response(data)
+        response = super().get(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data, self.cache_timeout)
+        return response
+
+
+IDEMPOTENCIA_TTL = timedelta(hours=24)
+IDEMPOTENCIA_EN_PROCESO_TTL = timedelta(minutes=1)
+
+
+class IdempotenciaMixin:
+    """
+    Respeta el header ``Idempotency-Key`` en ``POST``: la primera respuesta
+    exitosa se guarda por usuario y clave, y los reintentos con la misma clave
+    la reciben tal cual sin volver a escribir en la base. Si el reintento llega
+    mientras la solicitud original sigue en curso se responde 409.
+
+    Las claves van a la tabla ``ClaveIdempotencia`` y no a la caché: con la
+    caché local de cada worker dos reintentos en workers distintos crearían
+    dos órdenes. La restricción única de la tabla decide cuál se procesa.
+    """
+    idempotencia_prefijo = None
+
+    def post(self, request, *args, **kwargs):
+        clave = request.headers.get("Idempotency-Key", "").strip()
+        if not clave:
+            return super().post(request, *args, **kwargs)
+
+        filtro = {
+            "usuario_id": request.user.pk,
+            "vista": self.idempotencia_prefijo or type(self).__name__,
+            "clave": hashlib.sha256(clave.encode()).hexdigest(),
+        }
+        huella = hashlib.sha256(
+            json.dumps(request.data, sort_keys=True, default=str).encode()
+        ).hexdigest()
+
+        # Claves vencidas del usuario, y la misma clave si quedó en proceso de un worker que murió.
+        ahora = timezone.now()
+        ClaveIdempotencia.objects.filter(
+            Q(usuario_id=request.user.pk, creado__lt=ahora - IDEMPOTENCIA_TTL)
+            | Q(**filtro, estado="en_proceso", creado__lt=ahora - IDEMPOTENCIA_EN_PROCESO_TTL)
+        ).delete()
+
+        try:
+            with transaction.atomic():
+                registro = ClaveIdempotencia.objects.create(**filtro, huella=huella)
+        except IntegrityError:
+            return self._respuesta_guardada(filtro, huella)
+
+        try:
+            response = super().post(request, *args, **kwargs)
+        except Exception:
+            registro.delete()
+            raise
+        if 200 <= response.status_code < 300:
+            ClaveIdempotencia.objects.filter(pk=registro.pk).update(
+                estado="completado", status=response.status_code, respuesta=response.data,
+            )
+        else:
+            # Los errores no se guardan: el cliente puede corregir y reintentar con la misma clave.
+            registro.delete()
+        return response
+
+    def _respuesta_guardada(self, filtro, huella):
+        guardado = ClaveIdempotencia.objects.filter(**filtro).first()
+        if guardado is not None and guardado.huella != huella:
+            return Response(
+                {"detail": "La Idempotency-Key ya se usó con otros datos."},
+                status=422,
+            )
+        if guardado is None or guardado.estado != "completado":
+            return Response(
+                {"detail": "La solicitud original aún se está procesando."},
+                status=409,
+            )
+        response = Response(guardado.respuesta, status=guardado.status)
+        response["Idempotent-Replayed"] = "true"
+        return response
@@ -0,0 +1,96 @@
+"""
+Códigos de pedido sin consultar la base.
+
+Cada código son 60 bits escritos en 12 caracteres Crockford base32 (sin I, L,
+O ni U, para que se puedan dictar por teléfono sin confusiones):
+
+    42 bits  milisegundos desde 2024-01-01 (alcanza hasta ~2163)
+    10 bits  nodo: uno por proceso, se vuelve a asignar tras un fork
+     8 bits  secuencia dentro del mismo milisegundo
+
+El nodo sale de un contador en la caché (``cache.incr``) la primera vez que el
+proceso genera un código. Con la caché compartida (Redis) cada worker recibe
+uno distinto del de los 1023 procesos que arrancaron antes que él. Con la
+caché local de cada proceso (LocMem), o si la caché falla, el nodo se sortea.
+
+Dentro de un proceso los códigos son estrictamente crecientes; entre procesos
+solo podrían coincidir si dos workers tienen el mismo nodo y generan el mismo
+número de secuencia en el mismo milisegundo. El ``unique=True`` de
+``Order.code`` queda como red de seguridad.
+"""
+import os
+import secrets
+import threading
+import time
+
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+
+ALFABETO = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+LONGITUD = 12
+
+EPOCA_MS = 1704067200000  # 2024-01-01T00:00:00Z
+BITS_NODO = 10
+BITS_SECUENCIA = 8
+MAX_SECUENCIA = (1 << BITS_SECUENCIA) - 1
+NODO_KEY = "codigos:nodo"
+
+
+def asignar_nodo():
+    """Nodo para este proceso: el siguiente del contador compartido, o uno al azar."""
+    if isinstance(caches["default"], LocMemCache):
+        # Caché de este proceso (y copiada en los hijos de un fork): un contador no separaría nada.
+        return secrets.randbits(BITS_NODO)
+    try:
+        cache.add(NODO_KEY, 0, timeout=None)
+        return cache.incr(NODO_KEY) % (1 << BITS_NODO)
+    except Exception:
+        # Sin caché disponible no se bloquea la creación de pedidos.
+        return secrets.randbits(BITS_NODO)
+
+
+class GeneradorCodigos:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reiniciar()
+
+    def reiniciar(self):
+        self.nodo = None
+        self._ultimo_ms = 0
+        self._secuencia = 0
+
+    def _siguiente(self):
+        with self._lock:
+            if self.nodo is None:
+                self.nodo = asignar_nodo()
+            # max() evita repetir códigos si el reloj del sistema retrocede.
+            ms = max(int(time.time() * 1000) - EPOCA_MS, self._ultimo_ms)
+            if ms == self._ultimo_ms:
+                self._secuencia += 1
+                if self._secuencia > MAX_SECUENCIA:
+                    # Secuencia agotada en este milisegundo: se toma prestado el siguiente.
+                    ms += 1
+                    self._secuencia = 0
+            else:
+                self._secuencia = 0
+            self._ultimo_ms = ms
+            return (ms << (BITS_NODO + BITS_SECUENCIA)) | (self.nodo << BITS_SECUENCIA) | self._secuencia
+
+    def generar(self):
+        numero = self._siguiente()
+        caracteres = []
+        for _ in range(LONGITUD):
+            numero, resto = divmod(numero, 32)
+            caracteres.append(ALFABETO[resto])
+        return "".join(reversed(caracteres))
+
+
+generador = GeneradorCodigos()
+
+if hasattr(os, "register_at_fork"):
+    # Con gunicorn --preload los workers heredan el estado del padre.
+    os.register_at_fork(after_in_child=generador.reiniciar)
+
+
+def generar_codigo_orden():
+    return generador.generar()
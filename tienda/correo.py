@@ -0,0 +1,133 @@
+"""
+Cola de correo saliente.
+
+Las vistas solo insertan un ``CorreoSaliente`` (con ``enviar_plantilla``) y responden; el comando
+``manage.py enviar_correos`` toma los pendientes por lotes y los envía
+reutilizando una sola conexión SMTP por lote. Si un envío falla se reintenta
+con espera exponencial (1, 2, 4... minutos, hasta una hora) y tras
+``MAX_INTENTOS`` queda como ``fallido``.
+
+Un lote reclamado pasa a ``enviando`` con ``proximo_intento`` en el futuro:
+si el worker muere a la mitad, esos correos vuelven a estar disponibles
+cuando vence ese plazo.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import connection as db_connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import CorreoSaliente
+from .plantillas_correo import renderizar
+
+logger = logging.getLogger(__name__)
+
+MAX_INTENTOS = 6
+ESPERA_BASE = timedelta(minutes=1)
+ESPERA_MAXIMA = timedelta(hours=1)
+PLAZO_ENVIO = timedelta(minutes=5)
+
+
+def encolar_correo(para, asunto, texto, html="", remitente=None):
+    return CorreoSaliente.objects.create(
+        para=para,
+        remitente=remitente or settings.DEFAULT_FROM_EMAIL,
+        asunto=asunto,
+        texto=texto,
+        html=html,
+    )
+
+
+def enviar_plantilla(plantilla, para, /, **contexto):
+    """Renderiza ``plantilla`` (ver ``plantillas_correo.py``) y la encola para ``para``."""
+    asunto, texto, html = renderizar(plantilla, **contexto)
+    return encolar_correo(para, asunto, texto, html)
+
+
+def espera(intentos):
+    return min(ESPERA_BASE * (2 ** (intentos - 1)), ESPERA_MAXIMA)
+
+
+def reclamar_lote(tamano):
+    """Marca hasta ``tamano`` correos vencidos como ``enviando`` y los retorna."""
+    ahora = timezone.now()
+    with transaction.atomic():
+        correos = CorreoSaliente.objects.filter(
+            Q(estado="pendiente") | Q(estado="enviando"),
+            proximo_intento__lte=ahora,
+        ).order_by("proximo_intento", "id")
+        if db_connection.features.has_select_for_update_skip_locked:
+            # Varios workers pueden drenar la cola sin tomar los mismos correos.
+            correos = correos.select_for_update(skip_locked=True)
+        correos = list(correos[:tamano])
+        if correos:
+            CorreoSaliente.objects.filter(pk__in=[c.pk for c in correos]).update(
+                estado="enviando", proximo_intento=ahora + PLAZO_ENVIO,
+            )
+            for correo in correos:
+                correo.estado = "enviando"
+    return correos
+
+
+def _mensaje(correo, conexion):
+    mensaje = EmailMultiAlternatives(
+        subject=correo.asunto,
+        body=correo.texto,
+        from_email=correo.remitente,
+        to=[correo.para],
+        connection=conexion,
+    )
+    if correo.html:
+        mensaje.attach_alternative(correo.html, "text/html")
+    return mensaje
+
+
+def enviar_lote(tamano=50):
+    """Envía un lote con una sola conexión SMTP. Retorna (enviados, fallidos)."""
+    correos = reclamar_lote(tamano)
+    if not correos:
+        return 0, 0
+
+    enviados = fallidos = 0
+    conexion = get_connection()
+    try:
+        conexion.open()
+        for correo in correos:
+            correo.intentos += 1
+            try:
+                conexion.send_messages([_mensaje(correo, conexion)])
+            except Exception as e:
+                fallidos += 1
+                correo.ultimo_error = f"{type(e).__name__}: {e}"[:2000]
+                if correo.intentos >= MAX_INTENTOS:
+                    correo.estado = "fallido"
+                    logger.error("Correo %s a %s descartado tras %s intentos: %s",
+                                 correo.pk, correo.para, correo.intentos, e)
+                else:
+                    correo.estado = "pendiente"
+                    correo.proximo_intento = timezone.now() + espera(correo.intentos)
+                # La conexión puede haber quedado inservible: se reabre para el resto del lote.
+                conexion.close()
+                conexion.open()
+            else:
+                enviados += 1
+                correo.estado = "enviado"
+                correo.enviado = timezone.now()
+                correo.ultimo_error = ""
+    except Exception as e:
+        # No se pudo conectar: lo que no se intentó vuelve a la cola con espera.
+        logger.warning("No se pudo abrir la conexión SMTP: %s", e)
+        for correo in correos:
+            if correo.estado == "enviando":
+                correo.estado = "pendiente"
+                correo.proximo_intento = timezone.now() + ESPERA_BASE
+                correo.ultimo_error = f"{type(e).__name__}: {e}"[:2000]
+    finally:
+        conexion.close()
+        CorreoSaliente.objects.bulk_update(
+            correos, ["estado", "intentos", "proximo_intento", "ultimo_error", "enviado"]
+        )
+    return enviados, fallidos
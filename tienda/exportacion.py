@@ -0,0 +1,58 @@
+"""
+Exportación del catálogo completo en streaming (CSV o NDJSON).
+
+Las filas se leen con ``.iterator(chunk_size=...)`` (cursor del lado del
+servidor en PostgreSQL) y se escriben a medida que salen, así la memoria
+no crece con el tamaño del catálogo.
+"""
+import csv
+import json
+from datetime import datetime
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import Producto
+
+COLUMNAS = (
+    ("id", "id"),
+    ("codigo", "codigo"),
+    ("slug", "slug"),
+    ("nombre_producto", "nombre_producto"),
+    ("marca", "marca__nombre"),
+    ("categoria", "categoria__nombre"),
+    ("procedencia", "procedencia"),
+    ("precio_unitario", "precio_unitario"),
+    ("precio_mayoreo", "precio_mayoreo"),
+    ("stock", "stock"),
+    ("es_nuevo", "es_nuevo"),
+    ("es_destacado", "es_destacado"),
+    ("fecha_actualizacion", "fecha_actualizacion"),
+)
+CHUNK_SIZE = 2000
+
+
+def filas_exportacion(actualizado_desde=None):
+    queryset = Producto.objects.order_by("id")
+    if actualizado_desde is not None:
+        queryset = queryset.filter(fecha_actualizacion__gte=actualizado_desde)
+    return queryset.values_list(*(campo for _, campo in COLUMNAS)).iterator(chunk_size=CHUNK_SIZE)
+
+
+class _Eco:
+    """Pseudo-buffer para csv.writer: retorna la línea en vez de guardarla."""
+
+    def write(self, valor):
+        return valor
+
+
+def exportar_csv(filas):
+    writer = csv.writer(_Eco())
+    yield writer.writerow([nombre for nombre, _ in COLUMNAS])
+    for fila in filas:
+        yield writer.writerow([v.isoformat() if isinstance(v, datetime) else v for v in fila])
+
+
+def exportar_ndjson(filas):
+    nombres = [nombre for nombre, _ in COLUMNAS]
+    for fila in filas:
+        yield json.dumps(dict(zip(nombres, fila)), cls=DjangoJSONEncoder, ensure_ascii=False) + "\n"
@@ -0,0 +1,167 @@
+"""
+Facetas del sidebar de la tienda: cuántos productos hay por categoría, marca y
+procedencia, y el rango de ``precio_efectivo``, con una sola consulta agrupada.
+
+Los filtros de dimensión (categoria, marca, procedencia) se aplican en Python
+sobre los grupos, excluyendo la propia dimensión de cada faceta; así al elegir
+una categoría el sidebar sigue mostrando cuántos productos tienen las demás.
+
+El caso sin búsqueda ni rango de precio (el más común) se arma desde una tabla
+de grupos cacheada que las señales de ``Producto`` actualizan grupo por grupo.
+"""
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db.models import Count, F, Max, Min, Q
+
+from .models import Producto
+
+BASE_KEY = "catalogo:facetas:base"
+BASE_TTL = 60 * 5
+
+CAMPOS_GRUPO = (
+    "categoria_id", "categoria__nombre", "categoria__slug",
+    "marca_id", "marca__nombre", "marca__slug",
+    "procedencia",
+)
+
+
+def _agrupar(queryset, precios):
+    """Una fila por (categoria, marca, procedencia) con total y agregados de precio."""
+    filas = (
+        queryset.order_by()
+        .values(*CAMPOS_GRUPO)
+        .annotate(total=Count("id"), **precios)
+    )
+    return {(f["categoria_id"], f["marca_id"], f["procedencia"]): f for f in filas}
+
+
+def _precios_base():
+    return {
+        "min_publico": Min("precio_unitario"),
+        "max_publico": Max("precio_unitario"),
+        "min_mayoreo": Min("precio_mayoreo_efectivo"),
+        "max_mayoreo": Max("precio_mayoreo_efectivo"),
+    }
+
+
+def grupos_base():
+    grupos = cache.get(BASE_KEY)
+    if grupos is None:
+        grupos = _agrupar(Producto.objects.all(), _precios_base())
+        cache.set(BASE_KEY, grupos, BASE_TTL)
+    return grupos
+
+
+def grupo_de(producto):
+    return (producto.categoria_id, producto.marca_id, producto.procedencia)
+
+
+def actualizar_grupos(claves):
+    """Recalcula solo los grupos afectados por un cambio, si la tabla está cacheada."""
+    grupos = cache.get(BASE_KEY)
+    if grupos is None:
+        return
+    claves = {c for c in claves if c is not None}
+    if not claves:
+        return
+    condicion = Q()
+    for categoria_id, marca_id, procedencia in claves:
+        condicion |= Q(categoria_id=categoria_id, marca_id=marca_id, procedencia=procedencia)
+    nuevos = _agrupar(Producto.objects.filter(condicion), _precios_base())
+    for clave in claves:
+        if clave in nuevos:
+            grupos[clave] = nuevos[clave]
+        else:
+            grupos.pop(clave, None)
+    cache.set(BASE_KEY, grupos, BASE_TTL)
+
+
+def descartar_base():
+    cache.delete(BASE_KEY)
+
+
+def _coincide(valor_id, valor_slug, filtro):
+    if not filtro:
+        return True
+    return str(valor_id) == filtro if filtro.isdigit() else valor_slug == filtro
+
+
+def _formato_precio(valor):
+    """Mismo formato que los DecimalField del serializer ("12.50")."""
+    return None if valor is None else f"{Decimal(str(valor)):.2f}"
+
+
+def calcular_facetas(grupos, filtros, sufijo_precio=""):
+    """
+    Reduce los grupos a las facetas. ``sufijo_precio`` elige las columnas de
+    precio ("_publico"/"_mayoreo" en la tabla base, "" en consultas filtradas).
+    """
+    categoria = filtros.get("categoria", "")
+    marca = filtros.get("marca", "")
+    procedencia = filtros.get("procedencia", "")
+
+    categorias, marcas, procedencias = {}, {}, {}
+    total = 0
+    precio_min = precio_max = None
+
+    for fila in grupos.values():
+        ok_categoria = _coincide(fila["categoria_id"], fila["categoria__slug"], categoria)
+        ok_marca = _coincide(fila["marca_id"], fila["marca__slug"], marca)
+        ok_procedencia = not procedencia or procedencia in (fila["procedencia"] or "").lower()
+        n = fila["total"]
+
+        if ok_marca and ok_procedencia:
+            item = categorias.setdefault(fila["categoria_id"], {
+                "id": fila["categoria_id"],
+                "nombre": fila["categoria__nombre"],
+                "slug": fila["categoria__slug"],
+                "total": 0,
+            })
+            item["total"] += n
+        if ok_categoria and ok_procedencia:
+            item = marcas.setdefault(fila["marca_id"], {
+                "id": fila["marca_id"],
+                "nombre": fila["marca__nombre"],
+                "slug": fila["marca__slug"],
+                "total": 0,
+            })
+            item["total"] += n
+        if ok_categoria and ok_marca and fila["procedencia"]:
+            item = procedencias.setdefault(fila["procedencia"], {
+                "procedencia": fila["procedencia"],
+                "total": 0,
+            })
+            item["total"] += n
+
+        if ok_categoria and ok_marca and ok_procedencia:
+            total += n
+            fmin = fila["min" + sufijo_precio]
+            fmax = fila["max" + sufijo_precio]
+            precio_min = fmin if precio_min is None else min(precio_min, fmin)
+            precio_max = fmax if precio_max is None else max(precio_max, fmax)
+
+    return {
+        "total": total,
+        "categorias": sorted(categorias.values(), key=lambda c: c["nombre"]),
+        "marcas": sorted(marcas.values(), key=lambda m: m["nombre"]),
+        "procedencias": sorted(procedencias.values(), key=lambda p: p["procedencia"]),
+        "precio_min": _formato_precio(precio_min),
+        "precio_max": _formato_precio(precio_max),
+    }
+
+
+def facetas_catalogo(queryset, filtros):
+    """
+    ``queryset`` ya trae ``precio_efectivo`` y los filtros de búsqueda/precio;
+    sin esos filtros se usa la tabla base cacheada.
+    """
+    if not (filtros["search"] or filtros["min"] or filtros["max"]):
+        sufijo = "_mayoreo" if filtros["mayoreo"] else "_publico"
+        return calcular_facetas(grupos_base(), filtros, sufijo)
+
+    grupos = _agrupar(queryset, {
+        "min": Min(F("precio_efectivo")),
+        "max": Max(F("precio_efectivo")),
+    })
+    return calcular_facetas(grupos, filtros)
@@ -0,0 +1,128 @@
+"""
+Rendiciones de ``Producto.imagen`` (miniatura, tarjeta y detalle) en WebP y JPEG.
+
+Se guardan junto al original en el mismo storage, con un sufijo:
+``producto.jpg`` -> ``producto__card.webp``, ``producto__card.jpg``, ...
+La codificación corre en un pool de hilos después del commit, para que
+guardar un producto en el admin no espere a Pillow ni a la subida a Spaces.
+"""
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+RENDICIONES = {
+    "thumb": (160, 160),
+    "card": (400, 400),
+    "detail": (1200, 1200),
+}
+FORMATOS = {
+    "webp": ("WEBP", {"quality": 80, "method": 4}),
+    "jpeg": ("JPEG", {"quality": 82, "optimize": True, "progressive": True}),
+}
+EXTENSIONES = {"webp": "webp", "jpeg": "jpg"}
+
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="rendiciones")
+
+
+def nombre_rendicion(nombre, rendicion, formato):
+    base, _ = os.path.splitext(nombre)
+    return f"{base}__{rendicion}.{EXTENSIONES[formato]}"
+
+
+def nombres_rendiciones(nombre):
+    return [
+        nombre_rendicion(nombre, rendicion, formato)
+        for rendicion in RENDICIONES
+        for formato in FORMATOS
+    ]
+
+
+def urls_rendiciones(nombre, url):
+    """{"thumb": {"webp": ..., "jpeg": ...}, ...} usando ``url(nombre)`` para cada archivo."""
+    return {
+        rendicion: {formato: url(nombre_rendicion(nombre, rendicion, formato)) for formato in FORMATOS}
+        for rendicion in RENDICIONES
+    }
+
+
+def _codificar(imagen, formato):
+    pil_format, opciones = FORMATOS[formato]
+    if formato == "jpeg" and imagen.mode != "RGB":
+        fondo = Image.new("RGB", imagen.size, (255, 255, 255))
+        fondo.paste(imagen, mask=imagen.getchannel("A") if "A" in imagen.getbands() else None)
+        imagen = fondo
+    buffer = BytesIO()
+    imagen.save(buffer, pil_format, **opciones)
+    return buffer.getvalue()
+
+
+def _guardar(storage, nombre, contenido):
+    # S3 sobrescribe con el mismo nombre; otros storages renombrarían el archivo.
+    if not getattr(storage, "file_overwrite", False) and storage.exists(nombre):
+        storage.delete(nombre)
+    storage.save(nombre, ContentFile(contenido))
+
+
+def generar_rendiciones(storage, nombre):
+    """Lee el original y escribe todas las rendiciones. Retorna True si terminó bien."""
+    try:
+        with storage.open(nombre, "rb") as archivo:
+            original = Image.open(archivo)
+            original = ImageOps.exif_transpose(original)
+            original = original.convert("RGBA" if "A" in original.getbands() else "RGB")
+    except Exception:
+        logger.exception("No se pudo abrir la imagen %s", nombre)
+        return False
+
+    for rendicion, tamano in RENDICIONES.items():
+        imagen = original.copy()
+        imagen.thumbnail(tamano, Image.LANCZOS)
+        for formato in FORMATOS:
+            _guardar(storage, nombre_rendicion(nombre, rendicion, formato), _codificar(imagen, formato))
+    return True
+
+
+def eliminar_rendiciones(storage, nombre):
+    for archivo in nombres_rendiciones(nombre):
+        try:
+            storage.delete(archivo)
+        except Exception:
+            logger.warning("No se pudo eliminar la rendición %s", archivo)
+
+
+def encolar_eliminacion(storage, nombre):
+    _executor.submit(eliminar_rendiciones, storage, nombre)
+
+
+def _procesar(producto_id, storage, nombre, nombre_anterior):
+    from .cache import invalidar_catalogo
+    from .models import Producto
+
+    try:
+        if nombre_anterior:
+            eliminar_rendiciones(storage, nombre_anterior)
+        if nombre and generar_rendiciones(storage, nombre):
+            # update() no dispara señales: se invalida el catálogo a mano.
+            Producto.objects.filter(pk=producto_id, imagen=nombre).update(imagen_rendiciones=True)
+            invalidar_catalogo()
+    finally:
+        connection.close()
+
+
+def encolar_rendiciones(producto, nombre_anterior=None):
+    """
+    Programa en el pool, al confirmar la transacción, la limpieza de las
+    rendiciones de ``nombre_anterior`` y la generación de las de la imagen actual.
+    """
+    storage = producto.imagen.storage
+    nombre = producto.imagen.name or None
+    transaction.on_commit(
+        lambda: _executor.submit(_procesar, producto.pk, storage, nombre, nombre_anterior)
+    )
@@ -0,0 +1,264 @@
+"""
+Importación masiva de productos desde CSV/XLSX de proveedores.
+
+Las filas se leen en streaming y se escriben por lotes con
+``bulk_create(update_conflicts=True)`` sobre ``codigo``: una consulta por lote
+en lugar de varias por fila. Marcas y categorías se resuelven por nombre desde
+un mapa precargado, y los slugs nuevos se calculan en memoria.
+"""
+import csv
+import io
+import time
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.db import DatabaseError, IntegrityError, transaction
+from django.utils import timezone
+from django.utils.text import slugify
+
+from .cache import invalidar_catalogo
+from .facetas import descartar_base
+from .models import Categoria, Marca, Producto
+from .search import actualizar_vectores, indice_local
+
+COLUMNAS = (
+    "codigo", "nombre_producto", "descripcion", "marca", "categoria", "procedencia",
+    "precio_unitario", "precio_mayoreo", "stock", "es_nuevo", "es_destacado",
+)
+OBLIGATORIAS = ("codigo", "nombre_producto", "marca", "categoria", "precio_unitario")
+
+# Campos que se sobrescriben cuando el código ya existe, solo si el archivo trae
+# esa columna; slug, fecha_registro y fecha_novedad se conservan.
+CAMPOS_ACTUALIZABLES = [
+    "nombre_producto", "descripcion", "marca", "categoria", "procedencia",
+    "precio_unitario", "precio_mayoreo", "stock", "es_nuevo", "es_destacado",
+]
+
+VERDADEROS = {"1", "si", "sí", "true", "x", "yes"}
+
+# Se asignan después (marca/categoría) o los calcula el importador.
+CAMPOS_SIN_VALIDAR = {"marca", "categoria", "slug", "imagen", "search_vector"}
+
+
+def _mensajes(error):
+    if hasattr(error, "error_dict"):
+        return [f"{campo}: {' '.join(errores)}" for campo, errores in error.message_dict.items()]
+    return error.messages
+
+
+def _normalizar_encabezado(valor):
+    return str(valor or "").strip().lower().replace(" ", "_")
+
+
+def _fila(encabezados, valores):
+    """Todas las columnas del encabezado, aunque la fila venga más corta."""
+    return {h: valores[i] if i < len(valores) else None for i, h in enumerate(encabezados) if h}
+
+
+def leer_csv(archivo):
+    """Genera diccionarios por fila; ``archivo`` puede ser binario o de texto."""
+    if isinstance(archivo.read(0), bytes):
+        archivo = io.TextIOWrapper(archivo, encoding="utf-8-sig", newline="")
+    lector = csv.reader(archivo)
+    encabezados = [_normalizar_encabezado(h) for h in next(lector, [])]
+    for fila in lector:
+        yield _fila(encabezados, fila)
+
+
+def leer_xlsx(archivo):
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ValueError("Para importar XLSX se necesita el paquete 'openpyxl'.")
+    libro = load_workbook(archivo, read_only=True, data_only=True)
+    filas = libro.active.iter_rows(values_only=True)
+    encabezados = [_normalizar_encabezado(h) for h in next(filas, ())]
+    for fila in filas:
+        yield _fila(encabezados, fila)
+    libro.close()
+
+
+def leer_archivo(archivo, nombre):
+    if nombre.lower().endswith((".xlsx", ".xlsm")):
+        return leer_xlsx(archivo)
+    return leer_csv(archivo)
+
+
+def _texto(valor):
+    if valor is None:
+        return ""
+    if isinstance(valor, float) and valor.is_integer():
+        valor = int(valor)
+    return str(valor).strip()
+
+
+def _decimal(valor):
+    texto = _texto(valor).replace(",", ".")
+    if not texto:
+        return None
+    try:
+        numero = Decimal(texto)
+    except InvalidOperation:
+        raise ValueError(f"número inválido '{texto}'")
+    if numero < 0:
+        raise ValueError("el precio no puede ser negativo")
+    return numero.quantize(Decimal("0.01"))
+
+
+class ImportadorProductos:
+    def __init__(self, batch_size=500, crear_faltantes=True):
+        self.batch_size = batch_size
+        self.crear_faltantes = crear_faltantes
+        self.marcas = {m.nombre.lower(): m for m in Marca.objects.all()}
+        self.categorias = {c.nombre.lower(): c for c in Categoria.objects.all()}
+        self.slugs_por_codigo = dict(Producto.objects.values_list("codigo", "slug"))
+        self.slugs = set(self.slugs_por_codigo.values())
+        self.creados = 0
+        self.actualizados = 0
+        self.errores = []
+        self.campos_actualizables = None
+
+    def _resolver(self, mapa, modelo, nombre):
+        clave = nombre.lower()
+        if clave not in mapa:
+            if not self.crear_faltantes:
+                raise ValueError(f"{modelo._meta.verbose_name} '{nombre}' no existe")
+            nuevo = modelo(nombre=nombre)
+            try:
+                nuevo.full_clean()
+                with transaction.atomic():
+                    nuevo.save()
+            except (ValidationError, IntegrityError) as e:
+                detalle = "; ".join(_mensajes(e)) if isinstance(e, ValidationError) else "ya existe con otro nombre"
+                raise ValueError(f"no se pudo crear {modelo._meta.verbose_name} '{nombre}': {detalle}")
+            mapa[clave] = nuevo
+        return mapa[clave]
+
+    def _slug_unico(self, nombre, codigo):
+        # Misma forma que Producto.save(), pero contra el set en memoria y
+        # recortado al largo de la columna.
+        largo = Producto._meta.get_field("slug").max_length
+        base = slugify(f"{nombre}-{codigo}")
+        slug, num = base[:largo], 1
+        while slug in self.slugs:
+            sufijo = f"-{num}"
+            slug = base[:largo - len(sufijo)] + sufijo
+            num += 1
+        self.slugs.add(slug)
+        return slug
+
+    def _construir(self, fila, ahora):
+        datos = {col: _texto(fila.get(col)) for col in COLUMNAS}
+        faltantes = [col for col in OBLIGATORIAS if not datos[col]]
+        if faltantes:
+            raise ValueError(f"faltan columnas: {', '.join(faltantes)}")
+
+        stock = datos["stock"] or "0"
+        if not stock.isdigit():
+            raise ValueError(f"stock inválido '{stock}'")
+
+        es_nuevo = datos["es_nuevo"].lower() in VERDADEROS
+        producto = Producto(
+            codigo=datos["codigo"],
+            nombre_producto=datos["nombre_producto"],
+            descripcion=datos["descripcion"] or None,
+            procedencia=datos["procedencia"] or None,
+            precio_unitario=_decimal(datos["precio_unitario"]),
+            precio_mayoreo=_decimal(datos["precio_mayoreo"]),
+            stock=int(stock),
+            es_nuevo=es_nuevo,
+            fecha_novedad=ahora if es_nuevo else None,
+            es_destacado=datos["es_destacado"].lower() in VERDADEROS,
+        )
+        # Largos, dígitos y validadores del modelo, sin consultas; lo que la base
+        # rechazaría con DataError se reporta como error de la fila.
+        try:
+            producto.clean_fields(exclude=CAMPOS_SIN_VALIDAR)
+        except ValidationError as e:
+            raise ValueError("; ".join(_mensajes(e)))
+        producto.marca = self._resolver(self.marcas, Marca, datos["marca"])
+        producto.categoria = self._resolver(self.categorias, Categoria, datos["categoria"])
+        producto.slug = self.slugs_por_codigo.get(producto.codigo) \
+            or self._slug_unico(producto.nombre_producto, producto.codigo)
+        return producto
+
+    def _guardar_lote(self, lote):
+        """
+        Escribe ``lote`` (pares ``(fila, producto)``) en una consulta. Si la base
+        lo rechaza, reintenta fila por fila para reportar solo las que fallan.
+        """
+        try:
+            self._escribir([producto for _, producto in lote])
+        except DatabaseError as e:
+            if len(lote) == 1:
+                self.errores.append({"fila": lote[0][0], "error": f"la base rechazó la fila: {e}"})
+                return
+            for numero, producto in lote:
+                try:
+                    self._escribir([producto])
+                except DatabaseError as e:
+                    self.errores.append({"fila": numero, "error": f"la base rechazó la fila: {e}"})
+
+    def _escribir(self, lote):
+        # Un código repetido dentro del lote haría fallar el upsert: gana la última fila.
+        por_codigo = {p.codigo: p for p in lote}
+        productos = list(por_codigo.values())
+        nuevos = sum(1 for p in productos if p.codigo not in self.slugs_por_codigo)
+
+        with transaction.atomic():
+            Producto.objects.bulk_create(
+                productos,
+                update_conflicts=True,
+                unique_fields=["codigo"],
+                update_fields=self.campos_actualizables,
+            )
+            actualizar_vectores(Producto.objects.filter(codigo__in=por_codigo.keys()))
+
+        self.creados += nuevos
+        self.actualizados += len(productos) - nuevos
+        self.slugs_por_codigo.update((p.codigo, p.slug) for p in productos)
+
+    def importar(self, filas):
+        inicio = time.perf_counter()
+        ahora = timezone.now()
+        filas = iter(filas)
+        numero = 1  # fila 1 = encabezados
+        total = 0
+
+        while True:
+            bloque = list(islice(filas, self.batch_size))
+            if not bloque:
+                break
+            lote = []
+            for fila in bloque:
+                numero += 1
+                if not any(_texto(v) for v in fila.values()):
+                    continue
+                total += 1
+                if self.campos_actualizables is None:
+                    # Una columna que el archivo no trae no se toca en los productos existentes.
+                    self.campos_actualizables = [
+                        c for c in CAMPOS_ACTUALIZABLES if c in fila
+                    ] + ["fecha_actualizacion"]
+                try:
+                    lote.append((numero, self._construir(fila, ahora)))
+                except ValueError as e:
+                    self.errores.append({"fila": numero, "error": str(e)})
+            if lote:
+                self._guardar_lote(lote)
+
+        # bulk_create no dispara señales: invalidar a mano lo que depende de Producto.
+        indice_local.invalidar()
+        descartar_base()
+        invalidar_catalogo()
+
+        segundos = time.perf_counter() - inicio
+        return {
+            "filas": total,
+            "creados": self.creados,
+            "actualizados": self.actualizados,
+            "errores": self.errores,
+            "segundos": round(segundos, 3),
+            "filas_por_segundo": round(total / segundos, 1) if segundos else None,
+        }
@@ -0,0 +1,109 @@
+"""
+Movimientos de stock de las órdenes.
+
+Cada descuento es un ``UPDATE ... SET stock = stock - n WHERE stock >= n``:
+la base decide atómicamente si alcanza el stock, sin leer y guardar el
+producto en Python, así dos administradores no pueden sobrevender. Todo el
+pedido se aplica dentro de una transacción: si a un ítem no le alcanza,
+se deshace todo y se lanza ``StockInsuficiente``. Cada movimiento queda en
+``MovimientoStock``; las devoluciones reponen exactamente lo que se descontó.
+"""
+import logging
+
+from django.db import transaction
+from django.db.models import F, Sum
+from django.db.models.functions import Now
+
+from .cache import invalidar_catalogo
+from .models import MovimientoStock, OrderItem, Producto
+
+logger = logging.getLogger(__name__)
+
+
+class StockInsuficiente(Exception):
+    def __init__(self, faltantes):
+        self.faltantes = faltantes
+        super().__init__(f"Stock insuficiente para {len(faltantes)} producto(s)")
+
+
+def _registrar(order, movimientos):
+    MovimientoStock.objects.bulk_create([
+        MovimientoStock(order=order, producto_id=producto_id, tipo=tipo, cantidad=cantidad, aplicado=aplicado)
+        for producto_id, tipo, cantidad, aplicado in movimientos
+    ])
+    if any(aplicado for *_, aplicado in movimientos):
+        invalidar_catalogo()
+
+
+def descontar_stock_orden(order):
+    """
+    Descuenta el stock de todos los ítems de la orden o de ninguno. Retorna una
+    lista con ``{"producto_id", "cantidad", "aplicado"}`` por ítem; si a alguno
+    no le alcanza el stock, revierte los descuentos y lanza ``StockInsuficiente``
+    con ``{"producto_id", "producto", "cantidad", "disponible"}`` de cada faltante.
+    """
+    items = list(
+        OrderItem.objects.filter(order=order, producto__isnull=False)
+        .values_list("producto_id", "cantidad")
+    )
+    resultados = []
+    movimientos = []
+    faltantes = []
+    with transaction.atomic():
+        for producto_id, cantidad in items:
+            aplicado = bool(
+                Producto.objects.filter(pk=producto_id, stock__gte=cantidad)
+                .update(stock=F("stock") - cantidad, fecha_actualizacion=Now())
+            )
+            if not aplicado:
+                faltantes.append((producto_id, cantidad))
+            movimientos.append((producto_id, "salida", -cantidad, aplicado))
+            resultados.append({"producto_id": producto_id, "cantidad": cantidad, "aplicado": aplicado})
+        if faltantes:
+            # Stock actual de los faltantes, para que el admin vea cuánto hay.
+            productos = Producto.objects.in_bulk([pid for pid, _ in faltantes])
+            logger.warning("Stock insuficiente en orden %s: %s", order.code, faltantes)
+            raise StockInsuficiente([
+                {
+                    "producto_id": pid,
+                    "producto": productos[pid].nombre_producto if pid in productos else None,
+                    "cantidad": cantidad,
+                    "disponible": productos[pid].stock if pid in productos else 0,
+                }
+                for pid, cantidad in faltantes
+            ])
+        _registrar(order, movimientos)
+    return resultados
+
+
+def devolver_stock_orden(order):
+    """
+    Repone el stock descontado por la orden según el registro de movimientos
+    (los ítems que no se pudieron descontar no se reponen).
+    """
+    registro = MovimientoStock.objects.filter(order=order, producto__isnull=False)
+    pendientes = [
+        (fila["producto_id"], -fila["neto"])
+        for fila in registro.filter(aplicado=True)
+        .values("producto_id")
+        .annotate(neto=Sum("cantidad"))
+        .filter(neto__lt=0)
+    ]
+    if not pendientes and not registro.exists():
+        # Órdenes procesadas antes de existir el registro: se repone lo de los ítems.
+        pendientes = list(
+            OrderItem.objects.filter(order=order, producto__isnull=False)
+            .values_list("producto_id", "cantidad")
+        )
+
+    resultados = []
+    movimientos = []
+    with transaction.atomic():
+        for producto_id, cantidad in pendientes:
+            Producto.objects.filter(pk=producto_id).update(
+                stock=F("stock") + cantidad, fecha_actualizacion=Now()
+            )
+            movimientos.append((producto_id, "devolucion", cantidad, True))
+            resultados.append({"producto_id": producto_id, "cantidad": cantidad, "aplicado": True})
+        _registrar(order, movimientos)
+    return resultados
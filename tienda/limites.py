@@ -0,0 +1,191 @@
+"""
+Límites de intentos de login por correo y por IP.
+
+Los fallos se cuentan en ventanas deslizantes y, al superar el máximo, la
+clave queda bloqueada un tiempo. Todo vive en un store aparte (no en la fila
+de ``CustomUser``), así que rechazar un intento bloqueado no toca la base ni
+calcula ningún hash:
+
+- ``MemoriaLRU``: por proceso, con un máximo de claves (las menos usadas se
+  descartan primero). Sirve con un solo worker o en desarrollo.
+- ``RedisStore``: compartido entre workers, con un sorted set por clave.
+  Se usa cuando ``settings.LIMITES_REDIS_URL`` está definido.
+"""
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+
+from django.conf import settings
+from rest_framework.throttling import BaseThrottle
+
+
+class Regla:
+    def __init__(self, prefijo, maximo, ventana, bloqueo):
+        self.prefijo = prefijo
+        self.maximo = maximo
+        self.ventana = ventana
+        self.bloqueo = bloqueo
+
+    def clave(self, valor):
+        return f"{self.prefijo}:{valor}"
+
+
+# Mismos valores que tenía LoginView: 3 fallos bloquean el correo 15 minutos.
+POR_EMAIL = Regla("login:email", maximo=3, ventana=15 * 60, bloqueo=15 * 60)
+POR_IP = Regla("login:ip", maximo=20, ventana=15 * 60, bloqueo=15 * 60)
+
+
+class MemoriaLRU:
+    def __init__(self, max_claves=50_000):
+        self.max_claves = max_claves
+        self._intentos = OrderedDict()
+        self._bloqueos = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _recortar(self, mapa):
+        while len(mapa) > self.max_claves:
+            mapa.popitem(last=False)
+
+    def registrar(self, clave, ventana, ahora):
+        """Agrega un intento y retorna cuántos hay dentro de la ventana."""
+        with self._lock:
+            marcas = self._intentos.pop(clave, None) or deque()
+            while marcas and marcas[0] <= ahora - ventana:
+                marcas.popleft()
+            marcas.append(ahora)
+            self._intentos[clave] = marcas
+            self._recortar(self._intentos)
+            return len(marcas)
+
+    def contar(self, clave, ventana, ahora):
+        with self._lock:
+            marcas = self._intentos.get(clave)
+            return sum(1 for m in marcas if m > ahora - ventana) if marcas else 0
+
+    def bloquear(self, clave, hasta):
+        with self._lock:
+            self._bloqueos.pop(clave, None)
+            self._bloqueos[clave] = hasta
+            self._recortar(self._bloqueos)
+
+    def bloqueado_hasta(self, clave, ahora):
+        with self._lock:
+            hasta = self._bloqueos.get(clave)
+            if hasta is None:
+                return None
+            if hasta <= ahora:
+                del self._bloqueos[clave]
+                return None
+            return hasta
+
+    def reiniciar(self, clave):
+        with self._lock:
+            self._intentos.pop(clave, None)
+
+    def limpiar(self, clave):
+        with self._lock:
+            self._intentos.pop(clave, None)
+            self._bloqueos.pop(clave, None)
+
+
+class RedisStore:
+    def __init__(self, url):
+        try:
+            import redis
+        except ImportError:
+            raise ValueError("Para LIMITES_REDIS_URL se necesita el paquete 'redis'.")
+        self.redis = redis.Redis.from_url(url)
+
+    def registrar(self, clave, ventana, ahora):
+        clave = f"{clave}:intentos"
+        pipe = self.redis.pipeline()
+        pipe.zremrangebyscore(clave, 0, ahora - ventana)
+        pipe.zadd(clave, {uuid.uuid4().hex: ahora})
+        pipe.zcard(clave)
+        pipe.expire(clave, int(ventana) + 1)
+        return pipe.execute()[2]
+
+    def contar(self, clave, ventana, ahora):
+        return self.redis.zcount(f"{clave}:intentos", f"({ahora - ventana}", "+inf")
+
+    def bloquear(self, clave, hasta):
+        segundos = max(1, int(hasta - time.time()))
+        self.redis.set(f"{clave}:bloqueo", hasta, ex=segundos)
+
+    def bloqueado_hasta(self, clave, ahora):
+        hasta = self.redis.get(f"{clave}:bloqueo")
+        if hasta is None or float(hasta) <= ahora:
+            return None
+        return float(hasta)
+
+    def reiniciar(self, clave):
+        self.redis.delete(f"{clave}:intentos")
+
+    def limpiar(self, clave):
+        self.redis.delete(f"{clave}:intentos", f"{clave}:bloqueo")
+
+
+_store = None
+
+
+def store():
+    global _store
+    if _store is None:
+        url = getattr(settings, "LIMITES_REDIS_URL", None)
+        _store = RedisStore(url) if url else MemoriaLRU()
+    return _store
+
+
+def ip_cliente(request):
+    """Misma identificación que los throttles de DRF (respeta ``NUM_PROXIES``)."""
+    return BaseThrottle().get_ident(request)
+
+
+def _normalizar_email(email):
+    return (email or "").strip().lower()
+
+
+def bloqueo_login(email, ip):
+    """
+    (regla, segundos_restantes) del primer bloqueo vigente para el correo o
+    la IP, o (None, 0) si se puede intentar.
+    """
+    ahora = time.time()
+    for regla, valor in ((POR_EMAIL, _normalizar_email(email)), (POR_IP, ip)):
+        if not valor:
+            continue
+        hasta = store().bloqueado_hasta(regla.clave(valor), ahora)
+        if hasta:
+            return regla, int(hasta - ahora) + 1
+    return None, 0
+
+
+def registrar_fallo(email, ip):
+    """Cuenta el fallo; si se supera el máximo, bloquea la clave. Retorna la regla que bloqueó."""
+    ahora = time.time()
+    bloqueada = None
+    for regla, valor in ((POR_EMAIL, _normalizar_email(email)), (POR_IP, ip)):
+        if not valor:
+            continue
+        clave = regla.clave(valor)
+        if store().registrar(clave, regla.ventana, ahora) >= regla.maximo:
+            store().bloquear(clave, ahora + regla.bloqueo)
+            # Como antes en la fila del usuario: al bloquear, el contador vuelve a cero.
+            store().reiniciar(clave)
+            bloqueada = bloqueada or regla
+    return bloqueada
+
+
+def desbloquear_email(email):
+    store().limpiar(POR_EMAIL.clave(_normalizar_email(email)))
+
+
+def registrar_exito(email):
+    """
+    Un login correcto reinicia los fallos del correo (no los de la IP). Solo
+    se escribe en el store si había fallos, que es el caso raro.
+    """
+    clave = POR_EMAIL.clave(_normalizar_email(email))
+    if store().contar(clave, POR_EMAIL.ventana, time.time()):
+        store().reiniciar(clave)
@@ -0,0 +1,76 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from tienda.models import Cart, CartItem, CustomUser, Producto
+from tienda.views import CartDetailView
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Arma un carrito temporal con N productos (se descarta al final), mide el GET del "
+        "carrito y falla si las consultas dependen de la cantidad de ítems."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--items", type=int, default=100)
+        parser.add_argument("--repeticiones", type=int, default=20)
+        parser.add_argument("--mayoreo", action="store_true", help="Renderizar como cliente de mayoreo.")
+
+    def medir(self, user, repeticiones):
+        factory = APIRequestFactory()
+        vista = CartDetailView.as_view()
+        consultas = []
+
+        def contar(execute, sql, params, many, context):
+            consultas.append(sql)
+            return execute(sql, params, many, context)
+
+        inicio = time.perf_counter()
+        with connection.execute_wrapper(contar):
+            for _ in range(repeticiones):
+                request = factory.get("/api/cart/")
+                force_authenticate(request, user=user)
+                response = vista(request)
+                response.render()
+        ms = (time.perf_counter() - inicio) * 1000 / repeticiones
+        return len(consultas) / repeticiones, ms, response.data
+
+    def handle(self, *args, **options):
+        productos = list(Producto.objects.order_by("id").values_list("id", flat=True)[:options["items"]])
+        if not productos:
+            raise CommandError("No hay productos para armar el carrito.")
+
+        resultados = {}
+        try:
+            with transaction.atomic():
+                user = CustomUser.objects.create_user(
+                    email="bench-carrito@example.invalid", password=None,
+                    nombre="Bench", apellidos="Carrito",
+                    puede_ver_precios=True, puede_ver_precios_mayoreo=options["mayoreo"],
+                )
+                carrito = Cart.objects.create(usuario=user)
+                CartItem.objects.create(cart=carrito, producto_id=productos[0], cantidad=1)
+                resultados[1] = self.medir(user, options["repeticiones"])
+                CartItem.objects.bulk_create(
+                    CartItem(cart=carrito, producto_id=pid, cantidad=2) for pid in productos[1:]
+                )
+                resultados[len(productos)] = self.medir(user, options["repeticiones"])
+                raise Rollback
+        except Rollback:
+            pass
+
+        for n, (consultas, ms, data) in resultados.items():
+            self.stdout.write(
+                f"{n} ítem(s): {consultas:.0f} consultas, {ms:.2f} ms por request, total={data['total']}"
+            )
+        (pocas, _, _), (muchas, _, _) = resultados.values()
+        if len(productos) > 1 and muchas != pocas:
+            raise CommandError(f"El carrito hace {muchas:.0f} consultas con {len(productos)} ítems y {pocas:.0f} con 1.")
+        self.stdout.write(self.style.SUCCESS("Las consultas no dependen de la cantidad de ítems."))
@@ -0,0 +1,52 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory
+
+from tienda.models import CustomUser, Producto
+from tienda.serializers import ProductoCatalogoSerializer, ProductoSerializer
+
+
+class Command(BaseCommand):
+    help = "Mide el tiempo de serialización de una página del catálogo (ProductoSerializer vs camino rápido)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--page-size", type=int, default=40)
+        parser.add_argument("--repeticiones", type=int, default=200)
+        parser.add_argument("--email", help="Serializar como este usuario (por defecto anónimo).")
+
+    def handle(self, *args, **options):
+        request = APIRequestFactory().get("/api/productos/")
+        if options["email"]:
+            request.user = CustomUser.objects.get(email=options["email"])
+        else:
+            from django.contrib.auth.models import AnonymousUser
+            request.user = AnonymousUser()
+        context = {"request": request}
+
+        pagina = list(
+            Producto.objects.select_related("categoria", "marca")
+            .order_by("-fecha_registro", "-id")[:options["page_size"]]
+        )
+        if not pagina:
+            self.stdout.write("No hay productos para medir.")
+            return
+
+        renderer = JSONRenderer()
+        original = renderer.render(ProductoSerializer(pagina, many=True, context=context).data)
+        rapido = renderer.render(ProductoCatalogoSerializer(pagina, many=True, context=context).data)
+        if original != rapido:
+            self.stderr.write("El JSON del camino rápido difiere del de ProductoSerializer.")
+            self.stderr.write(json.dumps(json.loads(original)[0], indent=2))
+            self.stderr.write(json.dumps(json.loads(rapido)[0], indent=2))
+            return
+
+        for nombre, serializer_class in (("ProductoSerializer", ProductoSerializer),
+                                         ("ProductoCatalogoSerializer", ProductoCatalogoSerializer)):
+            inicio = time.perf_counter()
+            for _ in range(options["repeticiones"]):
+                serializer_class(pagina, many=True, context=context).data
+            ms = (time.perf_counter() - inicio) * 1000 / options["repeticiones"]
+            self.stdout.write(f"{nombre}: {ms:.3f} ms por página de {len(pagina)} productos")
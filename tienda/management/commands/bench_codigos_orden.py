@@ -0,0 +1,84 @@
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from tienda.codigos import generar_codigo_orden
+from tienda.models import CustomUser, Order
+
+
+def _generar(cantidad):
+    return [generar_codigo_orden() for _ in range(cantidad)]
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide el generador de códigos de pedido con hilos y procesos concurrentes, "
+        "verifica que no se repitan y cuenta las consultas por cada Order insertada."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--codigos", type=int, default=50000, help="Códigos por hilo/proceso.")
+        parser.add_argument("--hilos", type=int, default=8)
+        parser.add_argument("--procesos", type=int, default=4)
+        parser.add_argument("--insertar", type=int, default=0,
+                            help="Órdenes a insertar (dentro de una transacción que se revierte).")
+        parser.add_argument("--email", help="Usuario dueño de las órdenes de prueba.")
+
+    def _medir(self, nombre, pool_class, trabajadores, cantidad):
+        inicio = time.perf_counter()
+        with pool_class(max_workers=trabajadores) as pool:
+            lotes = list(pool.map(_generar, [cantidad] * trabajadores))
+        segundos = time.perf_counter() - inicio
+        codigos = [c for lote in lotes for c in lote]
+        repetidos = len(codigos) - len(set(codigos))
+        largos = {len(c) for c in codigos}
+        self.stdout.write(
+            f"{nombre}: {len(codigos)} códigos en {segundos:.3f} s "
+            f"({len(codigos) / segundos:,.0f}/s), repetidos: {repetidos}, longitud: {sorted(largos)}"
+        )
+        if repetidos:
+            raise CommandError("El generador produjo códigos repetidos.")
+
+    def _insertar(self, cantidad, email):
+        if not email:
+            raise CommandError("--insertar requiere --email.")
+        user = CustomUser.objects.get(email=email)
+        consultas = []
+
+        def contar(execute, sql, params, many, context):
+            consultas.append(sql)
+            return execute(sql, params, many, context)
+
+        try:
+            with transaction.atomic():
+                inicio = time.perf_counter()
+                with connection.execute_wrapper(contar):
+                    for _ in range(cantidad):
+                        Order.objects.create(
+                            user=user, dni="00000000", phone="000000000",
+                            address="bench", city="bench", state="bench",
+                            subtotal=Decimal("0"), total=Decimal("0"),
+                        )
+                segundos = time.perf_counter() - inicio
+                raise _Rollback
+        except _Rollback:
+            pass
+        self.stdout.write(
+            f"insertar: {cantidad} órdenes en {segundos:.3f} s, "
+            f"{len(consultas) / cantidad:.2f} consultas por orden"
+        )
+
+    def handle(self, *args, **options):
+        cantidad = options["codigos"]
+        self._medir("1 hilo", ThreadPoolExecutor, 1, cantidad)
+        self._medir(f"{options['hilos']} hilos", ThreadPoolExecutor, options["hilos"], cantidad)
+        self._medir(f"{options['procesos']} procesos", ProcessPoolExecutor, options["procesos"], cantidad)
+        if options["insertar"]:
+            self._insertar(options["insertar"], options["email"])
@@ -0,0 +1,41 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.template.loader import render_to_string
+
+from tienda.plantillas_correo import ASUNTOS, a_texto, compilar, inline_css, reglas_css, renderizar
+
+CONTEXTOS = {
+    "verificacion": {"codigo": "123456"},
+    "recuperar_password": {"nombre": "Juan Pérez", "enlace": "https://www.motorepuestodavila.com/reset-password?uid=MQ&token=abc"},
+}
+
+
+class Command(BaseCommand):
+    help = "Compara renderizar una plantilla precompilada contra armarla con Django en cada envío."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeticiones", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        n = options["repeticiones"]
+        for nombre in ASUNTOS:
+            contexto = CONTEXTOS[nombre]
+            compilar(nombre)
+
+            inicio = time.perf_counter()
+            for _ in range(n):
+                renderizar(nombre, **contexto)
+            precompilada = (time.perf_counter() - inicio) * 1_000_000 / n
+
+            # Lo mismo sin caché: layout, CSS en línea y texto plano en cada envío.
+            inicio = time.perf_counter()
+            for _ in range(n):
+                crudo = render_to_string(f"correos/{nombre}.html")
+                inline_css(crudo, reglas_css(render_to_string("correos/estilos.css")))
+                a_texto(crudo)
+            por_envio = (time.perf_counter() - inicio) * 1_000_000 / n
+
+            self.stdout.write(
+                f"{nombre}: precompilada {precompilada:.1f} µs, compilando por envío {por_envio:.1f} µs"
+            )
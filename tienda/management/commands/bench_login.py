@@ -0,0 +1,44 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from rest_framework.test import APIRequestFactory
+
+from tienda.views import LoginView
+
+ESCRITURAS = ("INSERT", "UPDATE", "DELETE")
+
+
+class Command(BaseCommand):
+    help = "Mide logins exitosos por segundo y cuántas consultas y escrituras hace cada uno."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--email", required=True)
+        parser.add_argument("--password", required=True)
+        parser.add_argument("--repeticiones", type=int, default=20)
+
+    def handle(self, *args, **options):
+        factory = APIRequestFactory()
+        vista = LoginView.as_view()
+        consultas = []
+
+        def contar(execute, sql, params, many, context):
+            consultas.append(sql)
+            return execute(sql, params, many, context)
+
+        n = options["repeticiones"]
+        datos = {"email": options["email"], "password": options["password"]}
+        inicio = time.perf_counter()
+        with connection.execute_wrapper(contar):
+            for _ in range(n):
+                response = vista(factory.post("/api/auth/login/", datos, format="json"))
+                if response.status_code != 200:
+                    self.stderr.write(f"Login falló con {response.status_code}: {response.data}")
+                    return
+        segundos = time.perf_counter() - inicio
+
+        escrituras = sum(1 for sql in consultas if sql.lstrip().split(" ", 1)[0].upper() in ESCRITURAS)
+        self.stdout.write(
+            f"{n / segundos:.1f} logins/s, {len(consultas) / n:.2f} consultas y "
+            f"{escrituras / n:.2f} escrituras por login"
+        )
@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from tienda.correo import enviar_lote
+
+
+class Command(BaseCommand):
+    help = "Envía los correos en cola (CorreoSaliente), una conexión SMTP por lote."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lote", type=int, default=50, help="Correos por conexión SMTP.")
+        parser.add_argument("--intervalo", type=float, default=5,
+                            help="Segundos de espera cuando la cola está vacía.")
+        parser.add_argument("--una-vez", action="store_true",
+                            help="Vaciar lo pendiente y salir (para cron).")
+
+    def handle(self, *args, **options):
+        total_enviados = total_fallidos = 0
+        while True:
+            close_old_connections()
+            enviados, fallidos = enviar_lote(options["lote"])
+            total_enviados += enviados
+            total_fallidos += fallidos
+            if enviados or fallidos:
+                self.stdout.write(f"Lote: {enviados} enviados, {fallidos} con error.")
+                if enviados:
+                    # Hubo avance: puede quedar más en la cola.
+                    continue
+            if options["una_vez"]:
+                break
+            time.sleep(options["intervalo"])
+        self.stdout.write(self.style.SUCCESS(
+            f"Cola vaciada: {total_enviados} enviados, {total_fallidos} con error."
+        ))
@@ -0,0 +1,73 @@
+from types import SimpleNamespace
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from tienda.views import ProductoDestacadoListView, ProductoListView, ProductoNuevoListView
+
+PAGINA = 20
+MAYOREO = SimpleNamespace(is_authenticated=True, puede_ver_precios_mayoreo=True)
+
+# (descripción, vista, query string, usuario, índice esperado, solo en PostgreSQL)
+# SQLite no deduce el predicado del índice parcial de novedades a partir del OR de la vista.
+CASOS = [
+    ("catálogo, recientes", ProductoListView, {}, None, "producto_fecha_idx", False),
+    ("catálogo por categoría", ProductoListView, {"categoria": "1"}, None, "producto_cat_fecha_idx", False),
+    ("catálogo por marca", ProductoListView, {"marca": "1"}, None, "producto_marca_fecha_idx", False),
+    ("precio ascendente", ProductoListView, {"sort": "price-asc"}, None, "producto_precio_idx", False),
+    ("precio descendente, mayoreo", ProductoListView, {"sort": "price-desc"}, MAYOREO,
+     "producto_precio_mayoreo_idx", False),
+    ("rango de precio, mayoreo", ProductoListView, {"min": "100", "max": "120", "sort": "price-asc"}, MAYOREO,
+     "producto_precio_mayoreo_idx", False),
+    ("nuevos", ProductoNuevoListView, {}, None, "producto_novedad_idx", True),
+    ("destacados", ProductoDestacadoListView, {}, None, "producto_destacado_idx", False),
+]
+
+
+def queryset_de(vista, params, usuario):
+    """El mismo queryset que arma la vista para ``?params``, limitado a una página."""
+    request = Request(APIRequestFactory().get("/", params))
+    request.user = usuario or AnonymousUser()
+    view = vista(request=request, args=(), kwargs={}, format_kwarg=None)
+    return view.get_queryset()[:PAGINA]
+
+
+class Command(BaseCommand):
+    help = (
+        "Corre EXPLAIN sobre las consultas del catálogo y verifica que cada una use "
+        "su índice (ver Producto.Meta.indexes). Sale con error si alguna no lo usa."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sin-forzar", action="store_true",
+            help="No desactivar el seq scan en PostgreSQL (con tablas chicas el planificador lo prefiere).",
+        )
+        parser.add_argument("--verbose-plan", action="store_true", help="Imprimir el plan completo de cada consulta.")
+
+    def handle(self, *args, **options):
+        fallos = []
+        postgresql = connection.vendor == "postgresql"
+        with transaction.atomic():
+            if postgresql and not options["sin_forzar"]:
+                # Solo para esta transacción: verifica que el índice sirve al plan, no su costo con pocos datos.
+                with connection.cursor() as cursor:
+                    cursor.execute("SET LOCAL enable_seqscan = off")
+            for descripcion, vista, params, usuario, indice, solo_postgresql in CASOS:
+                if solo_postgresql and not postgresql:
+                    self.stdout.write(f"--    {descripcion}: {indice} (solo se verifica en PostgreSQL)")
+                    continue
+                plan = queryset_de(vista, params, usuario).explain()
+                usa = indice in plan
+                if not usa:
+                    fallos.append(descripcion)
+                self.stdout.write(f"{'OK   ' if usa else 'FALLA'} {descripcion}: {indice}")
+                if options["verbose_plan"] or not usa:
+                    self.stdout.write("      " + plan.replace("\n", "\n      "))
+
+        if fallos:
+            raise CommandError(f"{len(fallos)} consulta(s) sin el índice esperado: {', '.join(fallos)}")
+        self.stdout.write(self.style.SUCCESS("Todas las consultas verificadas usan su índice."))
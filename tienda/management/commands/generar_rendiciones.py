@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from tienda.cache import invalidar_catalogo
+from tienda.imagenes import generar_rendiciones
+from tienda.models import Producto
+
+
+class Command(BaseCommand):
+    help = "Genera las rendiciones (thumb/card/detail en WebP y JPEG) de las imágenes de productos."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--todas", action="store_true",
+            help="Regenerar también los productos que ya tienen rendiciones.",
+        )
+
+    def handle(self, *args, **options):
+        productos = Producto.objects.exclude(imagen="").exclude(imagen__isnull=True)
+        if not options["todas"]:
+            productos = productos.filter(imagen_rendiciones=False)
+
+        storage = Producto._meta.get_field("imagen").storage
+        hechas = fallidas = 0
+        for pk, nombre in productos.values_list("pk", "imagen").iterator():
+            if generar_rendiciones(storage, nombre):
+                Producto.objects.filter(pk=pk, imagen=nombre).update(imagen_rendiciones=True)
+                hechas += 1
+            else:
+                fallidas += 1
+
+        if hechas:
+            invalidar_catalogo()
+        self.stdout.write(f"Rendiciones generadas: {hechas}. Fallidas: {fallidas}.")
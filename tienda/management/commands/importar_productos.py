@@ -0,0 +1,41 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from tienda.importacion import ImportadorProductos, leer_archivo
+
+
+class Command(BaseCommand):
+    help = "Importa o actualiza productos (upsert por código) desde un CSV o XLSX."
+
+    def add_arguments(self, parser):
+        parser.add_argument("archivo", help="Ruta al .csv o .xlsx")
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument(
+            "--no-crear", action="store_true",
+            help="No crear marcas/categorías que no existan (la fila se reporta como error).",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            archivo = open(options["archivo"], "rb")
+        except OSError as e:
+            raise CommandError(str(e))
+
+        importador = ImportadorProductos(
+            batch_size=options["batch_size"],
+            crear_faltantes=not options["no_crear"],
+        )
+        with archivo:
+            try:
+                resultado = importador.importar(leer_archivo(archivo, options["archivo"]))
+            except ValueError as e:
+                raise CommandError(str(e))
+
+        for error in resultado["errores"]:
+            self.stderr.write(f"Fila {error['fila']}: {error['error']}")
+        self.stdout.write(json.dumps({k: v for k, v in resultado.items() if k != "errores"}))
+        self.stdout.write(
+            f"{resultado['filas']} filas en {resultado['segundos']} s "
+            f"({resultado['filas_por_segundo']} filas/s)."
+        )
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from tienda import ventas
+
+
+class Command(BaseCommand):
+    help = "Recalcula desde Order/OrderItem las tablas del resumen de ventas (VentaHora, VentaHoraProducto)."
+
+    def handle(self, *args, **options):
+        filas, filas_producto = ventas.reconstruir()
+        self.stdout.write(self.style.SUCCESS(
+            f"Resumen reconstruido: {filas} filas por hora y estado, {filas_producto} por producto."
+        ))
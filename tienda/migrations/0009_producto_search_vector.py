@@ -0,0 +1,54 @@
+# Generated by Django 5.2.7 on 2026-10-18 08:33
+
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+
+def crear_indices_busqueda(apps, schema_editor):
+    """Índices GIN y carga inicial del search_vector; en SQLite no hace nada."""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        "CREATE INDEX IF NOT EXISTS tienda_producto_search_gin "
+        "ON tienda_producto USING gin (search_vector)"
+    )
+    # UPPER() porque icontains en PostgreSQL se traduce a UPPER(codigo) LIKE UPPER(%s).
+    schema_editor.execute(
+        "CREATE INDEX IF NOT EXISTS tienda_producto_codigo_trgm "
+        "ON tienda_producto USING gin (UPPER(codigo) gin_trgm_ops)"
+    )
+    schema_editor.execute(
+        """
+        UPDATE tienda_producto p SET search_vector =
+            setweight(to_tsvector('spanish', coalesce(p.nombre_producto, '') || ' ' || coalesce(p.codigo, '')), 'A')
+            || setweight(to_tsvector('spanish', coalesce(m.nombre, '') || ' ' || coalesce(c.nombre, '')), 'B')
+            || setweight(to_tsvector('spanish', coalesce(p.descripcion, '')), 'C')
+        FROM tienda_marca m, tienda_categoria c
+        WHERE m.id = p.marca_id AND c.id = p.categoria_id
+        """
+    )
+
+
+def eliminar_indices_busqueda(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute("DROP INDEX IF EXISTS tienda_producto_search_gin")
+    schema_editor.execute("DROP INDEX IF EXISTS tienda_producto_codigo_trgm")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tienda', '0008_alter_producto_categoria_alter_producto_marca'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='producto',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(crear_indices_busqueda, eliminar_indices_busqueda),
+    ]
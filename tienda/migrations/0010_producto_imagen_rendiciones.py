@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 08:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tienda', '0009_producto_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='producto',
+            name='imagen_rendiciones',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.7 on 2026-10-18 08:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tienda', '0011_producto_fecha_actualizacion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MovimientoStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('salida', 'Salida'), ('devolucion', 'Devolución')], max_length=20)),
+                ('cantidad', models.IntegerField(help_text='Negativa para salidas, positiva para devoluciones.')),
+                ('aplicado', models.BooleanField(default=True, help_text='False si no había stock suficiente.')),
+                ('creado', models.DateTimeField(auto_now_add=True)),
+                ('order', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='movimientos_stock', to='tienda.order')),
+                ('producto', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='movimientos_stock', to='tienda.producto')),
+            ],
+            options={
+                'verbose_name': 'Movimiento de stock',
+                'verbose_name_plural': 'Movimientos de stock',
+                'ordering': ['-creado'],
+            },
+        ),
+    ]
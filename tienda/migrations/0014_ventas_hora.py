@@ -0,0 +1,50 @@
+# Generated by Django 5.2.7 on 2026-10-18 08:48
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tienda', '0013_order_indices'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VentaHora',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hora', models.DateTimeField()),
+                ('status', models.CharField(choices=[('pending', 'Pendiente'), ('accepted', 'Aceptado'), ('rejected', 'Rechazado'), ('processing', 'En proceso'), ('completed', 'Completado'), ('cancelled', 'Cancelado')], max_length=20)),
+                ('pedidos', models.IntegerField(default=0)),
+                ('unidades', models.IntegerField(default=0)),
+                ('subtotal', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('total', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+            ],
+            options={
+                'verbose_name': 'Venta por hora',
+                'verbose_name_plural': 'Ventas por hora',
+                'ordering': ['hora'],
+                'unique_together': {('hora', 'status')},
+            },
+        ),
+        migrations.CreateModel(
+            name='VentaHoraProducto',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hora', models.DateTimeField()),
+                ('status', models.CharField(choices=[('pending', 'Pendiente'), ('accepted', 'Aceptado'), ('rejected', 'Rechazado'), ('processing', 'En proceso'), ('completed', 'Completado'), ('cancelled', 'Cancelado')], max_length=20)),
+                ('unidades', models.IntegerField(default=0)),
+                ('importe', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('categoria', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='ventas_hora', to='tienda.categoria')),
+                ('producto', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='ventas_hora', to='tienda.producto')),
+            ],
+            options={
+                'verbose_name': 'Venta por hora y producto',
+                'verbose_name_plural': 'Ventas por hora y producto',
+                'unique_together': {('hora', 'status', 'producto')},
+            },
+        ),
+    ]
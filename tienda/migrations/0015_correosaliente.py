@@ -0,0 +1,36 @@
+# Generated by Django 5.2.7 on 2026-10-18 08:50
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tienda', '0014_ventas_hora'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CorreoSaliente',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('para', models.EmailField(max_length=254)),
+                ('remitente', models.CharField(max_length=255)),
+                ('asunto', models.CharField(max_length=255)),
+                ('texto', models.TextField()),
+                ('html', models.TextField(blank=True)),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('enviando', 'Enviando'), ('enviado', 'Enviado'), ('fallido', 'Fallido')], default='pendiente', max_length=20)),
+                ('intentos', models.PositiveIntegerField(default=0)),
+                ('proximo_intento', models.DateTimeField(default=django.utils.timezone.now)),
+                ('ultimo_error', models.TextField(blank=True)),
+                ('creado', models.DateTimeField(auto_now_add=True)),
+                ('enviado', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Correo saliente',
+                'verbose_name_plural': 'Correos salientes',
+                'indexes': [models.Index(fields=['estado', 'proximo_intento'], name='correo_cola_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.7 on 2026-10-18 08:53
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tienda', '0015_correosaliente'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='customuser',
+            name='blocked_until',
+        ),
+        migrations.RemoveField(
+            model_name='customuser',
+            name='failed_login_attempts',
+        ),
+    ]
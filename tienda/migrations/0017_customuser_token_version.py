@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 08:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tienda', '0016_remove_customuser_bloqueo_login'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='token_version',
+            field=models.PositiveIntegerField(default=0, help_text='Se incrementa para invalidar los tokens emitidos (ver tokens.py).'),
+        ),
+    ]
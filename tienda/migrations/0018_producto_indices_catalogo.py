@@ -0,0 +1,42 @@
+# Generated by Django 5.2.7 on 2026-10-18 08:59
+
+import django.db.models.functions.comparison
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tienda', '0017_customuser_token_version'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='producto',
+            index=models.Index(fields=['categoria', '-fecha_registro', '-id'], name='producto_cat_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='producto',
+            index=models.Index(fields=['marca', '-fecha_registro', '-id'], name='producto_marca_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='producto',
+            index=models.Index(fields=['-fecha_registro', '-id'], name='producto_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='producto',
+            index=models.Index(django.db.models.functions.comparison.Coalesce('precio_mayoreo', 'precio_unitario'), models.F('id'), name='producto_precio_mayoreo_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='producto',
+            index=models.Index(fields=['precio_unitario', 'id'], name='producto_precio_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='producto',
+            index=models.Index(condition=models.Q(('es_nuevo', True), ('fecha_novedad__isnull', False), _connector='OR'), fields=['-fecha_novedad'], name='producto_novedad_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='producto',
+            index=models.Index(condition=models.Q(('es_destacado', True)), fields=['-fecha_registro'], name='producto_destacado_idx'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.7 on 2026-10-18 09:00
+
+import django.db.models.functions.comparison
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tienda', '0018_producto_indices_catalogo'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='producto',
+            name='producto_precio_mayoreo_idx',
+        ),
+        migrations.AddField(
+            model_name='producto',
+            name='precio_mayoreo_efectivo',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.functions.comparison.Coalesce('precio_mayoreo', 'precio_unitario'), output_field=models.DecimalField(decimal_places=2, max_digits=10)),
+        ),
+        migrations.AddIndex(
+            model_name='producto',
+            index=models.Index(fields=['precio_mayoreo_efectivo', 'id'], name='producto_precio_mayoreo_idx'),
+        ),
+    ]
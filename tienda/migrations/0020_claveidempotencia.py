@@ -0,0 +1,35 @@
+# Generated by Django 5.2.7 on 2026-10-18 09:15
+
+import django.core.serializers.json
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tienda', '0019_producto_precio_mayoreo_efectivo'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClaveIdempotencia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('vista', models.CharField(max_length=100)),
+                ('clave', models.CharField(help_text='SHA-256 del header.', max_length=64)),
+                ('huella', models.CharField(help_text='SHA-256 del cuerpo de la solicitud.', max_length=64)),
+                ('estado', models.CharField(choices=[('en_proceso', 'En proceso'), ('completado', 'Completado')], default='en_proceso', max_length=20)),
+                ('status', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('respuesta', models.JSONField(blank=True, encoder=django.core.serializers.json.DjangoJSONEncoder, null=True)),
+                ('creado', models.DateTimeField(auto_now_add=True)),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='claves_idempotencia', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Clave de idempotencia',
+                'verbose_name_plural': 'Claves de idempotencia',
+                'constraints': [models.UniqueConstraint(fields=('usuario', 'vista', 'clave'), name='idempotencia_unica')],
+            },
+        ),
+    ]
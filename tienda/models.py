@@ -3,19 +3,23 @@ from datetime import timedelta
 from decimal import Decimal
 from django.conf import settings
 from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
 from django.core.validators import RegexValidator, MinValueValidator, MaxValueValidator, EmailValidator
-from django.db import models
-from django.db.models import Sum, F
+from django.db import connection, models, transaction
+from django.db.models import Sum, F, Q
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 from django.utils.text import slugify
 from django.contrib.auth.models import AbstractBaseUser, PermissionsMixin, BaseUserManager
 from decimal import Decimal
 from django.db import models
-import random, string
 from django.db.models.signals import post_delete
 from django.dispatch import receiver
+from django.contrib.postgres.search import SearchVectorField
 from storages.backends.s3boto3 import S3Boto3Storage
 
+from .codigos import generar_codigo_orden
+
 class Categoria(models.Model):
     nombre = models.CharField(max_length=100, unique=True)
     slug = models.SlugField(unique=True, blank=True)
@@ -59,6 +63,7 @@ class Producto(models.Model):
         help_text="Código único del producto."
     )
     imagen = models.ImageField(storage=media_storage, blank=True, null=True)
+    imagen_rendiciones = models.BooleanField(default=False, editable=False)
 
     nombre_producto = models.CharField(
         max_length=200,
@@ -83,11 +88,19 @@ class Producto(models.Model):
         null=True,
         validators=[MinValueValidator(0)]
     )
+    # Precio que ve un cliente de mayoreo. Columna generada por la base, así que
+    # sigue a precio_mayoreo/precio_unitario también en bulk_create y .update().
+    precio_mayoreo_efectivo = models.GeneratedField(
+        expression=Coalesce("precio_mayoreo", "precio_unitario"),
+        output_field=models.DecimalField(max_digits=10, decimal_places=2),
+        db_persist=True,
+    )
     stock = models.PositiveIntegerField(
         default=0,
         validators=[MaxValueValidator(1000000)]
     )
     fecha_registro = models.DateTimeField(auto_now_add=True)
+    fecha_actualizacion = models.DateTimeField(auto_now=True, db_index=True)
 
     es_nuevo = models.BooleanField(default=False, help_text="Marcar si el producto es nuevo.")
     fecha_novedad = models.DateTimeField(blank=True, null=True, help_text="Fecha en que se marcó como nuevo.")
@@ -95,10 +108,31 @@ class Producto(models.Model):
     
     slug = models.SlugField(unique=True, blank=True, editable=False)
 
+    # Mantenido por tienda.search (índice GIN en PostgreSQL).
+    search_vector = SearchVectorField(null=True, editable=False)
+
     class Meta:
         verbose_name = "Producto"
         verbose_name_plural = "Productos"
         ordering = ['-fecha_registro']
+        indexes = [
+            # Catálogo (ProductoListView): más recientes primero, con o sin filtro
+            # de categoría/marca; el id desempata igual que la paginación keyset.
+            models.Index(fields=["categoria", "-fecha_registro", "-id"], name="producto_cat_fecha_idx"),
+            models.Index(fields=["marca", "-fecha_registro", "-id"], name="producto_marca_fecha_idx"),
+            models.Index(fields=["-fecha_registro", "-id"], name="producto_fecha_idx"),
+            # Orden y rango por precio: precio_efectivo es precio_mayoreo_efectivo
+            # para mayoreo y precio_unitario para el resto.
+            models.Index(fields=["precio_mayoreo_efectivo", "id"], name="producto_precio_mayoreo_idx"),
+            models.Index(fields=["precio_unitario", "id"], name="producto_precio_idx"),
+            # ProductoNuevoListView / ProductoDestacadoListView: pocas filas marcadas.
+            models.Index(
+                fields=["-fecha_novedad"],
+                condition=Q(es_nuevo=True) | Q(fecha_novedad__isnull=False),
+                name="producto_novedad_idx",
+            ),
+            models.Index(fields=["-fecha_registro"], condition=Q(es_destacado=True), name="producto_destacado_idx"),
+        ]
 
     def save(self, *args, **kwargs):
         if not self.slug:
@@ -113,6 +147,15 @@ class Producto(models.Model):
             self.fecha_novedad = timezone.now()
 
         super().save(*args, **kwargs)
+        # La base recalcula la columna generada; se vuelve a leer al accederla.
+        self.__dict__.pop("precio_mayoreo_efectivo", None)
+
+    def urls_rendiciones(self, url=None):
+        """URLs de miniatura/tarjeta/detalle (ver tienda.imagenes), o None si aún no existen."""
+        from .imagenes import urls_rendiciones
+        if not self.imagen or not self.imagen_rendiciones:
+            return None
+        return urls_rendiciones(self.imagen.name, url or self.imagen.storage.url)
 
     def es_reciente(self):
         """Retorna True si el producto tiene menos de 30 días desde su novedad o creación."""
@@ -127,8 +170,10 @@ class Producto(models.Model):
 
 @receiver(post_delete, sender=Producto)
 def eliminar_imagen_producto(sender, instance, **kwargs):
-    """Elimina el archivo de imagen del sistema cuando se borra el producto."""
+    """Elimina el archivo de imagen (y sus rendiciones) cuando se borra el producto."""
     if instance.imagen:
+        from .imagenes import encolar_eliminacion
+        encolar_eliminacion(instance.imagen.storage, instance.imagen.name)
         instance.imagen.delete(save=False)
 
 class CustomUserManager(BaseUserManager):
@@ -167,8 +212,7 @@ class CustomUser(AbstractBaseUser, PermissionsMixin):
     last_resend_time = models.DateTimeField(blank=True, null=True)
     puede_ver_precios = models.BooleanField(default=False, help_text="Permite ver el precio unitario de los productos.")
     puede_ver_precios_mayoreo = models.BooleanField(default=False, help_text="Permite ver el precio por mayoreo de los productos.")
-    failed_login_attempts = models.IntegerField(default=0)
-    blocked_until = models.DateTimeField(blank=True, null=True)
+    token_version = models.PositiveIntegerField(default=0, help_text="Se incrementa para invalidar los tokens emitidos (ver tokens.py).")
     objects = CustomUserManager()
 
     USERNAME_FIELD = "email"
@@ -211,23 +255,103 @@ class Cart(models.Model):
     def __str__(self):
         return f"Carrito de {self.usuario.email}"
     def add_producto(self, producto, cantidad=1):
-        item, created = self.items.get_or_create(producto=producto)
-        if not created:
-            item.cantidad += cantidad
-        else:
-            item.cantidad = cantidad
-        item.save()
-        return item
+        """
+        Suma ``cantidad`` a la línea del producto (o la crea) en una sola
+        sentencia ``INSERT ... ON CONFLICT DO UPDATE``: dos requests simultáneos
+        no pierden incrementos ni chocan con el unique (cart, producto).
+        """
+        sql, params = self._sql_sumar([(producto.pk, cantidad)])
+        with connection.cursor() as cursor:
+            if connection.features.can_return_columns_from_insert:
+                cursor.execute(sql + " RETURNING id, cantidad", params)
+                item_id, total = cursor.fetchone()
+                return CartItem(id=item_id, cart=self, producto=producto, cantidad=total)
+            cursor.execute(sql, params)
+        return self.items.get(producto=producto)
+
+    def _sql_sumar(self, lineas):
+        """``INSERT ... ON CONFLICT`` que suma cada ``(producto_id, cantidad)`` a la línea existente."""
+        tabla = connection.ops.quote_name(CartItem._meta.db_table)
+        valores = ", ".join(["(%s, %s, %s)"] * len(lineas))
+        sql = (
+            f"INSERT INTO {tabla} (cart_id, producto_id, cantidad) VALUES {valores} "
+            f"ON CONFLICT (cart_id, producto_id) DO UPDATE "
+            f"SET cantidad = {tabla}.cantidad + EXCLUDED.cantidad"
+        )
+        params = [valor for pid, cantidad in lineas for valor in (self.pk, pid, cantidad)]
+        return sql, params
+
     def update_cantidad(self, producto, cantidad):
-        item = self.items.filter(producto=producto).first()
-        if item:
-            if cantidad <= 0:
-                item.delete()
-            else:
-                item.cantidad = cantidad
-                item.save()
+        """Fija la cantidad (o borra la línea si es <= 0) con un solo UPDATE/DELETE."""
+        if cantidad <= 0:
+            self.remove_producto(producto)
+        else:
+            self.items.filter(producto=producto).update(cantidad=cantidad)
+
     def remove_producto(self, producto):
-        self.items.filter(producto=producto).delete()
+        """Borra la línea del producto. Retorna cuántas filas se borraron (0 o 1)."""
+        borradas, _ = self.items.filter(producto=producto).delete()
+        return borradas
+
+    def aplicar_operaciones(self, operaciones):
+        """
+        Aplica en orden una lista de ``{"producto_id", "cantidad", "op"}`` con
+        ``op`` en add/update/remove (misma semántica que add_producto,
+        update_cantidad y remove_producto). Lee las líneas afectadas una vez y
+        escribe con a lo sumo un INSERT que suma, un bulk_create, un bulk_update
+        y un delete.
+        """
+        ids = {op["producto_id"] for op in operaciones}
+        with transaction.atomic():
+            existentes = {
+                item.producto_id: item
+                for item in self.items.select_for_update().filter(producto_id__in=ids)
+            }
+            cantidades = {pid: item.cantidad for pid, item in existentes.items()}
+            # Productos cuya cantidad final la fija el lote (un remove o un update la pisó).
+            fijadas = set()
+            for op in operaciones:
+                pid, cantidad = op["producto_id"], op["cantidad"]
+                if op["op"] == "add":
+                    cantidades[pid] = cantidades.get(pid, 0) + cantidad
+                elif op["op"] == "update":
+                    if pid in cantidades:
+                        cantidades[pid] = cantidad
+                        fijadas.add(pid)
+                else:
+                    cantidades.pop(pid, None)
+                    fijadas.add(pid)
+
+            sumar, nuevos, cambiados, borrar = [], [], [], []
+            for pid in ids:
+                cantidad = cantidades.get(pid, 0)
+                item = existentes.get(pid)
+                if cantidad <= 0:
+                    if item:
+                        borrar.append(pid)
+                elif item is None and pid not in fijadas:
+                    sumar.append((pid, cantidad))
+                elif item is None:
+                    nuevos.append(CartItem(cart=self, producto_id=pid, cantidad=cantidad))
+                elif item.cantidad != cantidad:
+                    item.cantidad = cantidad
+                    cambiados.append(item)
+
+            if sumar:
+                # Igual que add_producto: si una pestaña paralela insertó la línea, se suma a lo suyo.
+                with connection.cursor() as cursor:
+                    cursor.execute(*self._sql_sumar(sumar))
+            if nuevos:
+                # Aquí el lote fija la cantidad: si la línea apareció en paralelo, queda la del lote.
+                self.items.bulk_create(
+                    nuevos, update_conflicts=True,
+                    unique_fields=["cart", "producto"], update_fields=["cantidad"],
+                )
+            if cambiados:
+                CartItem.objects.bulk_update(cambiados, ["cantidad"])
+            if borrar:
+                self.items.filter(producto_id__in=borrar).delete()
+
     @property
     def total(self):
         user = getattr(self, "usuario", None)
@@ -262,11 +386,8 @@ class CartItem(models.Model):
 
 
 def generate_unique_order_code():
-    """Genera un código aleatorio único para la orden"""
-    while True:
-        code = "".join(random.choices(string.ascii_uppercase + string.digits, k=8))
-        if not Order.objects.filter(code=code).exists():
-            return code
+    """Código de pedido único sin consultar la base (ver ``codigos.py``)."""
+    return generar_codigo_orden()
 
 class Order(models.Model):
     STATUS_CHOICES = [
@@ -308,6 +429,14 @@ class Order(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Listados de "mis pedidos" y del admin, más recientes primero.
+            models.Index(fields=["user", "-created_at"], name="order_user_fecha_idx"),
+            models.Index(fields=["status", "-created_at"], name="order_status_fecha_idx"),
+            models.Index(fields=["-created_at"], name="order_fecha_idx"),
+        ]
+
     def __str__(self):
         return f"Pedido {self.code} - {self.user.email if hasattr(self.user, 'email') else self.user}"
 
@@ -316,42 +445,51 @@ class Order(models.Model):
         Crea los OrderItems basándose en los productos del carrito.
         🔹 Ya no descuenta stock del producto.
         🔹 Solo valida que el stock sea suficiente.
+        🔹 Bloquea los productos con un solo SELECT ... FOR UPDATE y crea
+           todos los ítems con un bulk_create, dentro de una transacción.
         """
         if not cart:
             raise ValidationError("No se puede crear una orden sin un carrito.")
 
-        subtotal_total = Decimal("0.00")
+        with transaction.atomic():
+            cantidades = dict(cart.items.values_list("producto_id", "cantidad"))
+            productos = (
+                Producto.objects.select_for_update()
+                .filter(pk__in=cantidades.keys())
+                .only("id", "nombre_producto", "stock", "precio_unitario", "precio_mayoreo_efectivo")
+                .order_by("pk")
+            )
+            ve_mayoreo = getattr(self.user, "puede_ver_precios_mayoreo", False)
 
-        for item in cart.items.all():
-            producto = item.producto
-            cantidad = item.cantidad
+            items = []
+            subtotal_total = Decimal("0.00")
+            for producto in productos:
+                cantidad = cantidades[producto.pk]
 
-            if producto.stock < cantidad:
-                raise ValidationError(f"Stock insuficiente para {producto.nombre_producto}.")
+                if producto.stock < cantidad:
+                    raise ValidationError(f"Stock insuficiente para {producto.nombre_producto}.")
 
-            if getattr(self.user, "puede_ver_precios_mayoreo", False) and producto.precio_mayoreo:
-                price = producto.precio_mayoreo
-            else:
-                price = producto.precio_unitario
+                # Mismo precio que mostró el carrito (ver precio_carrito en serializers.py).
+                price = producto.precio_mayoreo_efectivo if ve_mayoreo else producto.precio_unitario
 
-            subtotal = cantidad * price
+                subtotal = cantidad * price
+                items.append(OrderItem(
+                    order=self,
+                    producto=producto,
+                    cantidad=cantidad,
+                    price=price,
+                    subtotal=subtotal,
+                ))
+                subtotal_total += subtotal
 
-            OrderItem.objects.create(
-                order=self,
-                producto=producto,
-                cantidad=cantidad,
-                price=price,
-                subtotal=subtotal,
-            )
+            OrderItem.objects.bulk_create(items)
 
-            subtotal_total += subtotal
+            self.subtotal = subtotal_total
+            self.total = subtotal_total + Decimal(self.shipping or 0)
+            self.save(update_fields=["subtotal", "total", "updated_at"])
 
-        self.subtotal = subtotal_total
-        self.total = subtotal_total + Decimal(self.shipping or 0)
-        self.save()
-
-        cart.activo = False
-        cart.save()
+            Cart.objects.filter(pk=cart.pk).update(activo=False)
+            cart.activo = False
 
         return self
 
@@ -401,3 +539,153 @@ class Wishlist(models.Model):
 
     def __str__(self):
         return f"{self.usuario.email} ❤️ {self.producto.nombre_producto}"
+
+
+class MovimientoStock(models.Model):
+    """Registro de cada cambio de stock hecho al procesar o anular una orden."""
+    TIPO_CHOICES = [
+        ('salida', 'Salida'),
+        ('devolucion', 'Devolución'),
+    ]
+
+    producto = models.ForeignKey(
+        'Producto',
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='movimientos_stock'
+    )
+    order = models.ForeignKey(
+        'Order',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='movimientos_stock'
+    )
+    tipo = models.CharField(max_length=20, choices=TIPO_CHOICES)
+    cantidad = models.IntegerField(help_text="Negativa para salidas, positiva para devoluciones.")
+    aplicado = models.BooleanField(default=True, help_text="False si no había stock suficiente.")
+    creado = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Movimiento de stock"
+        verbose_name_plural = "Movimientos de stock"
+        ordering = ['-creado']
+
+    def __str__(self):
+        producto_nombre = self.producto.nombre_producto if self.producto else "Producto eliminado"
+        return f"{self.get_tipo_display()} {self.cantidad} x {producto_nombre}"
+
+
+class VentaHora(models.Model):
+    """Órdenes creadas en una hora, por estado (lo mantiene ``ventas.py``)."""
+    hora = models.DateTimeField()
+    status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+    pedidos = models.IntegerField(default=0)
+    unidades = models.IntegerField(default=0)
+    subtotal = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"))
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"))
+
+    class Meta:
+        verbose_name = "Venta por hora"
+        verbose_name_plural = "Ventas por hora"
+        unique_together = ("hora", "status")
+        ordering = ['hora']
+
+    def __str__(self):
+        return f"{self.hora:%Y-%m-%d %H:00} {self.status}: {self.pedidos}"
+
+
+class VentaHoraProducto(models.Model):
+    """Unidades e importe vendidos de un producto en una hora, por estado de la orden."""
+    hora = models.DateTimeField()
+    status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+    producto = models.ForeignKey(
+        'Producto',
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='ventas_hora'
+    )
+    # Categoría al momento de la venta: si el producto cambia de categoría, lo vendido no se mueve.
+    categoria = models.ForeignKey(
+        'Categoria',
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='ventas_hora'
+    )
+    unidades = models.IntegerField(default=0)
+    importe = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"))
+
+    class Meta:
+        verbose_name = "Venta por hora y producto"
+        verbose_name_plural = "Ventas por hora y producto"
+        unique_together = ("hora", "status", "producto")
+
+    def __str__(self):
+        return f"{self.hora:%Y-%m-%d %H:00} {self.status}: {self.unidades} x {self.producto_id}"
+
+
+class CorreoSaliente(models.Model):
+    """Correo en cola; lo envía ``manage.py enviar_correos`` (ver ``correo.py``)."""
+    ESTADO_CHOICES = [
+        ('pendiente', 'Pendiente'),
+        ('enviando', 'Enviando'),
+        ('enviado', 'Enviado'),
+        ('fallido', 'Fallido'),
+    ]
+
+    para = models.EmailField()
+    remitente = models.CharField(max_length=255)
+    asunto = models.CharField(max_length=255)
+    texto = models.TextField()
+    html = models.TextField(blank=True)
+    estado = models.CharField(max_length=20, choices=ESTADO_CHOICES, default='pendiente')
+    intentos = models.PositiveIntegerField(default=0)
+    proximo_intento = models.DateTimeField(default=timezone.now)
+    ultimo_error = models.TextField(blank=True)
+    creado = models.DateTimeField(auto_now_add=True)
+    enviado = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        verbose_name = "Correo saliente"
+        verbose_name_plural = "Correos salientes"
+        indexes = [
+            models.Index(fields=["estado", "proximo_intento"], name="correo_cola_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.asunto} → {self.para} ({self.estado})"
+
+
+class ClaveIdempotencia(models.Model):
+    """
+    ``Idempotency-Key`` recibida en un ``POST`` (ver ``IdempotenciaMixin`` en
+    ``cache.py``). La restricción única es la que impide que dos workers
+    procesen la misma clave a la vez.
+    """
+    ESTADO_CHOICES = [
+        ('en_proceso', 'En proceso'),
+        ('completado', 'Completado'),
+    ]
+
+    usuario = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='claves_idempotencia'
+    )
+    vista = models.CharField(max_length=100)
+    clave = models.CharField(max_length=64, help_text="SHA-256 del header.")
+    huella = models.CharField(max_length=64, help_text="SHA-256 del cuerpo de la solicitud.")
+    estado = models.CharField(max_length=20, choices=ESTADO_CHOICES, default='en_proceso')
+    status = models.PositiveSmallIntegerField(blank=True, null=True)
+    respuesta = models.JSONField(blank=True, null=True, encoder=DjangoJSONEncoder)
+    creado = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Clave de idempotencia"
+        verbose_name_plural = "Claves de idempotencia"
+        constraints = [
+            models.UniqueConstraint(fields=["usuario", "vista", "clave"], name="idempotencia_unica"),
+        ]
+
+    def __str__(self):
+        return f"{self.vista} {self.clave[:8]} ({self.estado})"
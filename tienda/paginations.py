@@ -1,6 +1,147 @@
-from rest_framework.pagination import PageNumberPagination
+import base64
+import json
+from collections import OrderedDict
+
+from django.core.paginator import Paginator as DjangoPaginator
+from django.db.models import Q
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def view_count(queryset, view):
+    """Usa ``view.get_total_count`` (cacheado/estimado) si la vista lo define."""
+    count_func = getattr(view, 'get_total_count', None)
+    return count_func(queryset) if count_func else queryset.count()
+
+
+class CountedPaginator(DjangoPaginator):
+    def __init__(self, object_list, per_page, count_func=None, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.count_func = count_func
+
+    @cached_property
+    def count(self):
+        if self.count_func is None:
+            return super().count
+        return self.count_func(self.object_list)
+
 
 class ProductPagination(PageNumberPagination):
-    page_size = 40  
-    page_size_query_param = 'page_size'  
-    max_page_size = 100 
\ No newline at end of file
+    page_size = 40
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.view = view
+        return super().paginate_queryset(queryset, request, view)
+
+    def django_paginator_class(self, queryset, page_size):
+        return CountedPaginator(
+            queryset, page_size, count_func=lambda qs: view_count(qs, self.view)
+        )
+
+
+class ProductKeysetPagination(BasePagination):
+    """
+    Paginación por cursor (keyset) para el catálogo.
+
+    En vez de ``OFFSET N`` filtra a partir de la última fila entregada
+    usando el orden del queryset, p. ej. ``(-fecha_registro, -id)`` o
+    ``(precio_efectivo, id)``, así que cada página cuesta lo mismo sin
+    importar qué tan abajo esté el cliente. El ``COUNT(*)`` solo se
+    ejecuta con ``?count=true``.
+    """
+    page_size = ProductPagination.page_size
+    page_size_query_param = ProductPagination.page_size_query_param
+    max_page_size = ProductPagination.max_page_size
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    invalid_cursor_message = 'Cursor inválido.'
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def get_ordering(self, queryset):
+        ordering = [o for o in queryset.query.order_by if isinstance(o, str)]
+        if not ordering:
+            ordering = list(queryset.model._meta.ordering)
+        if not any(o.lstrip('-') in ('id', 'pk') for o in ordering):
+            ordering.append('-id' if ordering and ordering[0].startswith('-') else 'id')
+        return ordering
+
+    def encode_cursor(self, ordering, values):
+        payload = json.dumps({'o': ordering, 'v': values}, default=str, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, raw, ordering):
+        try:
+            raw += '=' * (-len(raw) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(raw.encode()).decode())
+            values = payload['v']
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+        # Un cursor generado con otro ``sort`` no sirve para este orden.
+        if payload.get('o') != ordering or len(values) != len(ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return values
+
+    def keyset_filter(self, ordering, values):
+        """(a, b) > (x, y) expandido a OR de comparaciones, respetando asc/desc por campo."""
+        condition = Q()
+        for i, field in enumerate(ordering):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            branch = Q(**{f'{name}__{lookup}': values[i]})
+            for prev_field, prev_value in zip(ordering[:i], values[:i]):
+                branch &= Q(**{prev_field.lstrip('-'): prev_value})
+            condition |= branch
+        return condition
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(queryset)
+        queryset = queryset.order_by(*self.ordering)
+
+        self.count = None
+        if request.query_params.get(self.count_query_param) in ('1', 'true', 'True'):
+            self.count = view_count(queryset, view)
+
+        raw = request.query_params.get(self.cursor_query_param)
+        if raw:
+            values = self.decode_cursor(raw, self.ordering)
+            queryset = queryset.filter(self.keyset_filter(self.ordering, values))
+
+        rows = list(queryset[:self.page_size + 1])
+        self.has_next = len(rows) > self.page_size
+        self.page = rows[:self.page_size]
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        last = self.page[-1]
+        values = [getattr(last, field.lstrip('-')) for field in self.ordering]
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, self.count_query_param)
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.ordering, values))
+
+    def get_paginated_response(self, data):
+        response = OrderedDict([('next', self.get_next_link())])
+        if self.count is not None:
+            response['count'] = self.count
+        response['results'] = data
+        return Response(response)
+
+
+class OrderPagination(PageNumberPagination):
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
@@ -0,0 +1,164 @@
+"""
+Plantillas de correo transaccional.
+
+Cada plantilla de ``templates/correos/`` extiende ``base.html`` y se compila
+una sola vez por proceso (``TiendaConfig.ready``): Django arma el layout, las
+reglas de ``estilos.css`` se copian como ``style=""`` en cada elemento (muchos
+clientes de correo ignoran ``<style>``) y la versión de texto plano se deriva
+del mismo HTML. Lo que queda son ``string.Template`` con marcadores
+``$variable``, así que renderizar un correo es solo una sustitución.
+
+Los elementos con clase ``solo-html`` (adornos) no pasan al texto plano.
+"""
+import html
+import re
+from functools import cache
+from html.parser import HTMLParser
+from string import Template
+
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+ASUNTOS = {
+    "verificacion": "Código de verificación - Davila Tienda",
+    "recuperar_password": "Recupera tu contraseña",
+}
+
+_ETIQUETA = re.compile(r"<([a-zA-Z][\w-]*)(\s[^<>]*?)?(\s*/?)>")
+_CLASE = re.compile(r'\sclass="([^"]*)"')
+_ESTILO = re.compile(r'\sstyle="([^"]*)"')
+
+BLOQUES = {"p", "div", "h1", "h2", "h3", "h4", "br", "tr", "li", "table"}
+OMITIDOS = {"style", "script", "head", "title"}
+VACIOS = {"br", "img", "hr", "meta", "link", "input"}
+
+
+def reglas_css(css):
+    """``{"clase": "prop: valor; ..."}`` para selectores de clase simples."""
+    css = re.sub(r"/\*.*?\*/", "", css, flags=re.S)
+    reglas = {}
+    for selectores, cuerpo in re.findall(r"([^{}]+)\{([^}]*)\}", css):
+        declaraciones = "; ".join(d.strip() for d in cuerpo.split(";") if d.strip())
+        for selector in selectores.split(","):
+            selector = selector.strip()
+            if not re.fullmatch(r"\.[\w-]+", selector):
+                raise ValueError(f"Selector no soportado en estilos de correo: {selector!r}")
+            clase = selector[1:]
+            reglas[clase] = f"{reglas[clase]}; {declaraciones}" if clase in reglas else declaraciones
+    return reglas
+
+
+def inline_css(contenido, reglas):
+    """Reemplaza ``class="..."`` por el ``style`` equivalente; el style propio del elemento gana."""
+    def reemplazar(m):
+        etiqueta, atributos, cierre = m.group(1), m.group(2) or "", m.group(3)
+        clase = _CLASE.search(atributos)
+        if not clase:
+            return m.group(0)
+        estilos = [reglas[c] for c in clase.group(1).split() if c in reglas]
+        propio = _ESTILO.search(atributos)
+        if propio:
+            estilos.append(propio.group(1).strip().rstrip(";"))
+        atributos = _ESTILO.sub("", _CLASE.sub("", atributos))
+        if estilos:
+            atributos += f' style="{"; ".join(estilos)}"'
+        return f"<{etiqueta}{atributos}{cierre}>"
+    return _ETIQUETA.sub(reemplazar, contenido)
+
+
+class _Texto(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.partes = []
+        self.pila = []
+        self.omitir_desde = None
+        self.enlace = None
+        self.inicio_enlace = 0
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag not in VACIOS:
+            self.pila.append(tag)
+            if self.omitir_desde is None and (
+                tag in OMITIDOS or "solo-html" in (attrs.get("class") or "").split()
+            ):
+                self.omitir_desde = len(self.pila)
+        if self.omitir_desde is not None:
+            return
+        if tag in BLOQUES:
+            self.partes.append("\n")
+        if tag == "a":
+            self.enlace = attrs.get("href")
+            self.inicio_enlace = len(self.partes)
+
+    def handle_endtag(self, tag):
+        if tag in VACIOS or not self.pila:
+            return
+        omitido = self.omitir_desde is not None
+        self.pila.pop()
+        if omitido and len(self.pila) < self.omitir_desde:
+            self.omitir_desde = None
+            return
+        if omitido:
+            return
+        if tag == "a" and self.enlace:
+            texto = "".join(self.partes[self.inicio_enlace:]).strip()
+            if texto != self.enlace:
+                self.partes.append(f": {self.enlace}")
+            self.enlace = None
+        if tag in BLOQUES:
+            self.partes.append("\n")
+
+    def handle_data(self, data):
+        if self.omitir_desde is None:
+            self.partes.append(re.sub(r"\s+", " ", data))
+
+    def texto(self):
+        lineas = [linea.strip() for linea in "".join(self.partes).splitlines()]
+        return re.sub(r"\n{3,}", "\n\n", "\n".join(lineas)).strip() + "\n"
+
+
+def a_texto(contenido):
+    """Texto plano legible a partir del HTML de una plantilla."""
+    parser = _Texto()
+    parser.feed(contenido)
+    parser.close()
+    return parser.texto()
+
+
+class PlantillaCompilada:
+    def __init__(self, asunto, texto, contenido_html):
+        self.asunto = Template(asunto)
+        self.texto = Template(texto)
+        self.html = Template(contenido_html)
+
+    def renderizar(self, **contexto):
+        escapado = {clave: html.escape(str(valor)) for clave, valor in contexto.items()}
+        return (
+            self.asunto.substitute(contexto),
+            self.texto.substitute(contexto),
+            self.html.substitute(escapado),
+        )
+
+
+@cache
+def _reglas():
+    return reglas_css(render_to_string("correos/estilos.css"))
+
+
+@cache
+def compilar(nombre):
+    crudo = render_to_string(f"correos/{nombre}.html")
+    return PlantillaCompilada(ASUNTOS[nombre], a_texto(crudo), inline_css(crudo, _reglas()))
+
+
+def precompilar():
+    for nombre in ASUNTOS:
+        compilar(nombre)
+
+
+def renderizar(plantilla, /, **contexto):
+    """(asunto, texto, html) de ``plantilla`` con ``contexto`` sustituido."""
+    # El año del pie va como variable: la plantilla compilada vive lo que dure el proceso.
+    contexto.setdefault("anio", timezone.localdate().year)
+    return compilar(plantilla).renderizar(**contexto)
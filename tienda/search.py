@@ -0,0 +1,194 @@
+"""
+Motor de búsqueda del catálogo.
+
+En PostgreSQL cada producto guarda un ``search_vector`` (tsvector con índice GIN)
+y ``codigo`` tiene un índice trigram para coincidencias parciales del código
+de repuesto. En SQLite (tests y desarrollo local) se usa un índice invertido
+en memoria que se reconstruye cuando cambian productos, marcas o categorías.
+"""
+import re
+import threading
+import unicodedata
+from bisect import bisect_left
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connections
+from django.db.models import Case, F, FloatField, IntegerField, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Cast
+from rest_framework import filters
+
+from .models import Categoria, Marca, Producto
+
+SEARCH_CONFIG = "spanish"
+
+# Pesos por campo, equivalentes a los de setweight() en PostgreSQL.
+PESOS = {"A": 4, "B": 2, "C": 1}
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def normalizar(texto):
+    """Minúsculas y sin tildes, para comparar 'bujía' con 'bujia'."""
+    texto = unicodedata.normalize("NFKD", texto or "")
+    return "".join(c for c in texto if not unicodedata.combining(c)).lower()
+
+
+def tokenizar(texto):
+    return _TOKEN_RE.findall(normalizar(texto))
+
+
+def es_postgres(using="default"):
+    return connections[using].vendor == "postgresql"
+
+
+def vector_producto():
+    """Expresión tsvector de un producto; marca y categoría entran como subconsultas."""
+    marca = Subquery(Marca.objects.filter(pk=OuterRef("marca_id")).values("nombre")[:1])
+    categoria = Subquery(Categoria.objects.filter(pk=OuterRef("categoria_id")).values("nombre")[:1])
+    return (
+        SearchVector("nombre_producto", "codigo", weight="A", config=SEARCH_CONFIG)
+        + SearchVector(marca, categoria, weight="B", config=SEARCH_CONFIG)
+        + SearchVector("descripcion", weight="C", config=SEARCH_CONFIG)
+    )
+
+
+def actualizar_vectores(queryset):
+    """Recalcula search_vector para los productos del queryset (solo PostgreSQL)."""
+    if es_postgres(queryset.db):
+        queryset.update(search_vector=vector_producto())
+
+
+class IndiceInvertido:
+    """
+    Índice invertido en memoria para bases sin full-text (SQLite).
+    Se construye perezosamente y se descarta con ``invalidar()``.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._postings = None
+        self._vocabulario = []
+        self._codigos = {}
+
+    def invalidar(self):
+        with self._lock:
+            self._postings = None
+
+    def _construir(self):
+        postings = {}
+        codigos = {}
+        filas = Producto.objects.values_list(
+            "id", "nombre_producto", "codigo", "marca__nombre", "categoria__nombre", "descripcion"
+        )
+        for pk, nombre, codigo, marca, categoria, descripcion in filas.iterator():
+            codigos[pk] = normalizar(codigo)
+            campos = (
+                ("A", nombre), ("A", codigo),
+                ("B", marca), ("B", categoria),
+                ("C", descripcion),
+            )
+            for peso, texto in campos:
+                for token in tokenizar(texto):
+                    scores = postings.setdefault(token, {})
+                    scores[pk] = scores.get(pk, 0) + PESOS[peso]
+        self._vocabulario = sorted(postings)
+        self._codigos = codigos
+        self._postings = postings
+
+    def _coincidencias_prefijo(self, token):
+        """Suma de pesos de todos los términos que empiezan por ``token``."""
+        scores = {}
+        i = bisect_left(self._vocabulario, token)
+        while i < len(self._vocabulario) and self._vocabulario[i].startswith(token):
+            for pk, score in self._postings[self._vocabulario[i]].items():
+                scores[pk] = scores.get(pk, 0) + score
+            i += 1
+        return scores
+
+    def buscar(self, termino):
+        """Retorna {producto_id: rank} para los productos que contienen todos los términos."""
+        with self._lock:
+            if self._postings is None:
+                self._construir()
+
+            tokens = tokenizar(termino)
+            if not tokens:
+                return {}
+
+            resultado = None
+            for token in tokens:
+                scores = self._coincidencias_prefijo(token)
+                if resultado is None:
+                    resultado = scores
+                else:
+                    resultado = {pk: resultado[pk] + s for pk, s in scores.items() if pk in resultado}
+                if not resultado:
+                    break
+            resultado = resultado or {}
+
+            codigo = normalizar(termino).strip()
+            for pk, cod in self._codigos.items():
+                if codigo and codigo in cod:
+                    resultado[pk] = resultado.get(pk, 0) + PESOS["A"]
+            return resultado
+
+
+indice_local = IndiceInvertido()
+
+
+def _tsquery_prefijos(termino):
+    """'filtro ace' -> 'filtro:* & ace:*' para buscar mientras el cliente escribe."""
+    # Sin quitar tildes: el diccionario 'spanish' de PostgreSQL las conserva.
+    return " & ".join(f"{token}:*" for token in _TOKEN_RE.findall(termino.lower()))
+
+
+def buscar_productos(queryset, termino):
+    """
+    Filtra ``queryset`` por ``termino`` y anota ``rank`` (mayor es más relevante).
+    """
+    termino = (termino or "").strip()
+    if not termino:
+        return queryset
+
+    if es_postgres(queryset.db):
+        tsquery = _tsquery_prefijos(termino)
+        condicion = Q(codigo__icontains=termino)
+        if tsquery:
+            query = SearchQuery(tsquery, config=SEARCH_CONFIG, search_type="raw")
+            condicion |= Q(search_vector=query)
+            # ts_rank devuelve real; como double precision el valor que va en el
+            # cursor de ProductKeysetPagination compara igual en la página siguiente.
+            rank = Cast(SearchRank(F("search_vector"), query), FloatField())
+        else:
+            rank = Value(0.0, output_field=FloatField())
+        return queryset.filter(condicion).annotate(rank=rank)
+
+    ranking = indice_local.buscar(termino)
+    if not ranking:
+        return queryset.none().annotate(rank=Value(0))
+    return queryset.filter(pk__in=ranking.keys()).annotate(
+        rank=Case(
+            *[When(pk=pk, then=Value(score)) for pk, score in ranking.items()],
+            default=Value(0),
+            output_field=IntegerField(),
+        )
+    )
+
+
+class ProductoSearchFilter(filters.BaseFilterBackend):
+    """
+    Reemplaza a SearchFilter en el catálogo: usa ``?search=`` igual que antes,
+    pero sin ILIKE sobre cuatro columnas. Si el cliente no pide un ``sort``
+    explícito, los resultados se ordenan por relevancia.
+    """
+    search_param = "search"
+
+    def filter_queryset(self, request, queryset, view):
+        termino = request.query_params.get(self.search_param, "")
+        if not termino.strip():
+            return queryset
+
+        queryset = buscar_productos(queryset, termino)
+        if not request.query_params.get("sort"):
+            queryset = queryset.order_by("-rank", "-fecha_registro", "-id")
+        return queryset
@@ -1,6 +1,9 @@
 from rest_framework import serializers
 from django.contrib.auth.password_validation import validate_password
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.tokens import RefreshToken
 from .models import (
     
     Producto,
@@ -12,6 +15,13 @@ from .models import (
     PendingUser,Order, OrderItem,Wishlist, Producto,Cart, CartItem, Producto
 )
 from django.core.exceptions import ValidationError
+from django.db import models, transaction
+from django.utils import timezone
+from django.utils.encoding import filepath_to_uri
+from datetime import timedelta
+from .cache import audiencia
+from . import ventas
+from .tokens import agregar_claims
 class UserRegisterSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, required=True, validators=[validate_password])
     password2 = serializers.CharField(write_only=True, required=True)
@@ -103,6 +113,7 @@ class ProductoSerializer(serializers.ModelSerializer):
 
         if instance.imagen:
             data["imagen"] = instance.imagen.url
+        data["imagenes"] = instance.urls_rendiciones()
 
         if user and user.is_authenticated:
             if user.is_staff or user.is_superuser:
@@ -116,42 +127,175 @@ class ProductoSerializer(serializers.ModelSerializer):
 
         return data
 
+class ProductoCatalogoListSerializer(serializers.ListSerializer):
+    """
+    Camino rápido para páginas del catálogo: produce exactamente el mismo JSON
+    que ``ProductoSerializer(many=True)``, pero calcula una sola vez por página
+    el corte de ``isNew``, la audiencia de precios y el prefijo de las URLs de
+    imagen, y arma diccionarios planos sin recorrer los campos por cada fila.
+    """
+
+    CAMPOS_PRECIO = {
+        "staff": ("precio_unitario", "precio_mayoreo"),
+        "mayoreo": ("precio_mayoreo",),
+        "publico": ("precio_unitario",),
+    }
+
+    def _prefijo_imagen(self):
+        storage = Producto._meta.get_field("imagen").storage
+        custom_domain = getattr(storage, "custom_domain", None)
+        if not custom_domain or getattr(storage, "cloudfront_signer", None):
+            return None
+        location = getattr(storage, "location", "")
+        return f"{storage.url_protocol}//{custom_domain}/", f"{location}/" if location else ""
+
+    def to_representation(self, data):
+        iterable = data.all() if isinstance(data, models.manager.BaseManager) else data
+
+        request = self.context.get("request")
+        precios = self.CAMPOS_PRECIO[audiencia(request.user if request else None)]
+        limite = timezone.now() - timedelta(days=7)
+        prefijo = self._prefijo_imagen()
+
+        campos = self.child.fields
+        fecha = campos["fecha_registro"].to_representation
+        decimal = campos["precio_unitario"].to_representation
+
+        resultado = []
+        if prefijo:
+            url = lambda nombre: prefijo[0] + filepath_to_uri(prefijo[1] + nombre)
+        else:
+            url = None
+
+        for p in iterable:
+            imagen = (url(p.imagen.name) if url else p.imagen.url) if p.imagen else None
+            marca = p.marca
+            categoria = p.categoria
+            row = {
+                "id": p.id,
+                "codigo": p.codigo,
+                "imagen": imagen,
+                "nombre_producto": p.nombre_producto,
+                "descripcion": p.descripcion,
+                "marca": p.marca_id,
+                "marca_detalle": {"id": marca.id, "nombre": marca.nombre, "slug": marca.slug},
+                "categoria": p.categoria_id,
+                "categoria_detalle": {"id": categoria.id, "nombre": categoria.nombre, "slug": categoria.slug},
+                "procedencia": p.procedencia,
+                "stock": p.stock,
+                "fecha_registro": fecha(p.fecha_registro),
+                "es_nuevo": p.es_nuevo,
+                "fecha_novedad": fecha(p.fecha_novedad) if p.fecha_novedad else None,
+                "es_destacado": p.es_destacado,
+                "slug": p.slug,
+            }
+            for campo in precios:
+                valor = getattr(p, campo)
+                row[campo] = decimal(valor) if valor is not None else None
+            row["isNew"] = (p.fecha_novedad or p.fecha_registro) >= limite
+            row["imagenes"] = p.urls_rendiciones(url)
+            resultado.append(row)
+        return resultado
+
+
+class ProductoCatalogoSerializer(ProductoSerializer):
+    """ProductoSerializer con el camino rápido para listas (``many=True``)."""
+
+    class Meta(ProductoSerializer.Meta):
+        list_serializer_class = ProductoCatalogoListSerializer
+
+
+class CartProductoSerializer(serializers.ModelSerializer):
+    """
+    Producto dentro del carrito: solo lo que muestra una línea (sin descripción,
+    categoría ni fechas), con los precios que le tocan al usuario como en el catálogo.
+    """
+    marca_detalle = MarcaSerializer(source="marca", read_only=True)
+
+    class Meta:
+        model = Producto
+        fields = [
+            "id",
+            "codigo",
+            "slug",
+            "imagen",
+            "nombre_producto",
+            "marca_detalle",
+            "stock",
+            "precio_unitario",
+            "precio_mayoreo",
+        ]
+        read_only_fields = fields
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        if instance.imagen:
+            data["imagen"] = instance.imagen.url
+        data["imagenes"] = instance.urls_rendiciones()
+        request = self.context.get("request")
+        visibles = ProductoCatalogoListSerializer.CAMPOS_PRECIO[audiencia(request.user if request else None)]
+        for campo in ("precio_unitario", "precio_mayoreo"):
+            if campo not in visibles:
+                data.pop(campo)
+        return data
+
+
+def precio_carrito(user):
+    """
+    Función ``producto -> precio`` con la que se cobran las líneas del carrito
+    para ``user``, o None si no puede ver precios.
+    """
+    if getattr(user, "puede_ver_precios_mayoreo", False):
+        return lambda producto: producto.precio_mayoreo_efectivo
+    if not user.is_authenticated or getattr(user, "puede_ver_precios", False):
+        return lambda producto: producto.precio_unitario
+    return None
+
+
 class CartItemSerializer(serializers.ModelSerializer):
-    producto = ProductoSerializer(read_only=True) 
+    producto = CartProductoSerializer(read_only=True)
     subtotal = serializers.SerializerMethodField()
     class Meta:
         model = CartItem
         fields = ["id", "producto", "cantidad", "subtotal"]
 
     def get_subtotal(self, obj):
-        user = self.context.get("request").user
-        if getattr(user, "puede_ver_precios_mayoreo", False) and obj.producto.precio_mayoreo:
-            return obj.cantidad * obj.producto.precio_mayoreo
-        elif getattr(user, "puede_ver_precios", False) or not user.is_authenticated:
-            return obj.cantidad * obj.producto.precio_unitario
-        return None  
+        precio = precio_carrito(self.context.get("request").user)
+        return obj.cantidad * precio(obj.producto) if precio else None
 
 class CartSerializer(serializers.ModelSerializer):
+    """
+    Espera el carrito con ``items`` prefetcheados (ver ``carrito_con_items`` en
+    views.py): así se renderiza con un número fijo de consultas. El total se
+    suma de los subtotales ya calculados, sin volver a recorrer los items.
+    """
     items = CartItemSerializer(many=True, read_only=True)
-    total = serializers.SerializerMethodField()
 
     class Meta:
         model = Cart
-        fields = ["id", "usuario", "creado", "items", "total"]
+        fields = ["id", "usuario", "creado", "items"]
         read_only_fields = ["usuario", "creado"]
 
-    def get_total(self, obj):
-        user = self.context.get("request").user
-        if getattr(user, "puede_ver_precios_mayoreo", False):
-            total = sum(
-                item.cantidad * (item.producto.precio_mayoreo or item.producto.precio_unitario)
-                for item in obj.items.all()
-            )
-            return total
-        elif getattr(user, "puede_ver_precios", False) or not user.is_authenticated:
-            total = sum(item.cantidad * item.producto.precio_unitario for item in obj.items.all())
-            return total
-        return None
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        if precio_carrito(self.context.get("request").user):
+            data["total"] = sum(item["subtotal"] for item in data["items"])
+        else:
+            data["total"] = None
+        return data
+
+class CartOperacionSerializer(serializers.Serializer):
+    """Una operación del lote de ``CartBatchView``."""
+    OPERACIONES = ("add", "update", "remove")
+
+    producto_id = serializers.IntegerField()
+    cantidad = serializers.IntegerField(min_value=0, default=1)
+    op = serializers.ChoiceField(choices=OPERACIONES, default="add")
+
+    def validate(self, attrs):
+        if attrs["op"] == "add" and attrs["cantidad"] < 1:
+            raise serializers.ValidationError({"cantidad": "Para agregar, la cantidad debe ser al menos 1."})
+        return attrs
 
 class CustomUserSerializer(serializers.ModelSerializer):
     class Meta:
@@ -175,7 +319,7 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
         token["email"] = user.email
         token["nombre"] = user.nombre
         token["apellidos"] = user.apellidos
-        return token
+        return agregar_claims(token, user)
 
     def validate(self, attrs):
         data = super().validate(attrs)
@@ -189,6 +333,23 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
             "apellidos": self.user.apellidos,
         })
         return data
+
+class CustomTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    Emite el access token nuevo con los permisos y la ``token_version``
+    actuales del usuario, leídos de la base (ver ``tokens.py``).
+    """
+    def validate(self, attrs):
+        refresh = RefreshToken(attrs["refresh"])
+        user_id = refresh.payload.get(jwt_settings.USER_ID_CLAIM)
+        user = CustomUser.objects.filter(**{jwt_settings.USER_ID_FIELD: user_id}).first()
+        if not user or not jwt_settings.USER_AUTHENTICATION_RULE(user):
+            raise AuthenticationFailed(
+                self.error_messages["no_active_account"], "no_active_account"
+            )
+        agregar_claims(refresh, user)
+        return {"access": str(refresh.access_token)}
+
 class WishlistProductoSerializer(serializers.ModelSerializer):
     imagen = serializers.ImageField(required=False, allow_null=True)
 
@@ -212,6 +373,7 @@ class WishlistProductoSerializer(serializers.ModelSerializer):
         user = request.user if request else None
         if instance.imagen and request:
             data["imagen"] = request.build_absolute_uri(instance.imagen.url)
+        data["imagenes"] = instance.urls_rendiciones()
 
         if user and user.is_authenticated:
             if user.is_staff or user.is_superuser:
@@ -241,7 +403,7 @@ class WishlistSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         user = self.context['request'].user
         producto = validated_data['producto']
-        wishlist_item, created = Wishlist.objects.get_or_create(usuario=user, producto=producto)
+        wishlist_item, created = Wishlist.objects.get_or_create(usuario_id=user.id, producto=producto)
         return wishlist_item
 
 class OrderItemSerializer(serializers.ModelSerializer):
@@ -304,7 +466,9 @@ class OrderSerializer(serializers.ModelSerializer):
             raise ValidationError("El carrito no existe o ya fue procesado.")
         validated_data.pop("user", None)
         validated_data.pop("cart", None)
-        order = Order.objects.create(user=user, cart=cart, **validated_data)
-        order.create_items_from_cart(cart)
+        with transaction.atomic():
+            order = Order.objects.create(user=user, cart=cart, **validated_data)
+            order.create_items_from_cart(cart)
+            ventas.registrar_orden(order)
 
         return order
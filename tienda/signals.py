@@ -0,0 +1,100 @@
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .models import Categoria, Marca, Order, Producto
+from . import facetas, imagenes, search, ventas
+from .cache import invalidar_catalogo
+
+
+@receiver(pre_save, sender=Producto)
+def recordar_estado_anterior(sender, instance, raw=False, **kwargs):
+    """
+    Guarda el grupo de facetas anterior (solo si la tabla base está en caché) y,
+    si se subió o quitó la imagen, el nombre de la anterior. Un guardado sin
+    cambios de imagen y sin facetas en caché no consulta la base.
+    """
+    instance._grupo_facetas_anterior = None
+    instance._imagen_anterior = None
+    instance._imagen_cambiada = False
+    if raw or not instance.pk:
+        return
+    # Un archivo recién asignado aún no está en el storage (_committed=False),
+    # aunque tenga el mismo nombre que el anterior (S3 con file_overwrite).
+    subida = bool(instance.imagen) and not instance.imagen._committed
+    quitada = not instance.imagen and instance.imagen_rendiciones
+    con_facetas = cache.get(facetas.BASE_KEY) is not None
+    if not (subida or quitada or con_facetas):
+        return
+    anterior = (
+        Producto.objects.filter(pk=instance.pk)
+        .values_list('categoria_id', 'marca_id', 'procedencia', 'imagen')
+        .first()
+    )
+    if anterior is None:
+        return
+    if con_facetas:
+        instance._grupo_facetas_anterior = anterior[:3]
+    if subida or quitada:
+        instance._imagen_anterior = anterior[3] or None
+        instance._imagen_cambiada = True
+        instance.imagen_rendiciones = False
+
+
+@receiver(post_save, sender=Producto)
+def generar_rendiciones_imagen(sender, instance, created=False, raw=False, **kwargs):
+    """Encola las rendiciones cuando la imagen es nueva o cambió, o si aún no se generaron."""
+    if raw:
+        return
+    actual = instance.imagen.name or None
+    if not getattr(instance, '_imagen_cambiada', False) and (actual is None or instance.imagen_rendiciones):
+        return
+    anterior = getattr(instance, '_imagen_anterior', None)
+    imagenes.encolar_rendiciones(instance, nombre_anterior=anterior if anterior != actual else None)
+
+
+@receiver(post_save, sender=Producto)
+def actualizar_busqueda_producto(sender, instance, raw=False, **kwargs):
+    """Mantiene el search_vector del producto y descarta el índice en memoria."""
+    if raw:
+        return
+    search.actualizar_vectores(Producto.objects.filter(pk=instance.pk))
+    search.indice_local.invalidar()
+    facetas.actualizar_grupos([
+        getattr(instance, '_grupo_facetas_anterior', None),
+        facetas.grupo_de(instance),
+    ])
+    invalidar_catalogo()
+
+
+@receiver(post_save, sender=Marca)
+@receiver(post_save, sender=Categoria)
+def actualizar_busqueda_relacionados(sender, instance, created=False, raw=False, **kwargs):
+    """Renombrar una marca o categoría cambia el texto indexado de sus productos."""
+    if raw:
+        return
+    if not created:
+        search.actualizar_vectores(instance.productos.all())
+        search.indice_local.invalidar()
+        facetas.descartar_base()
+    invalidar_catalogo()
+
+
+@receiver(post_delete, sender=Producto)
+def quitar_producto_busqueda(sender, instance, **kwargs):
+    search.indice_local.invalidar()
+    facetas.actualizar_grupos([facetas.grupo_de(instance)])
+    invalidar_catalogo()
+
+
+@receiver(post_delete, sender=Marca)
+@receiver(post_delete, sender=Categoria)
+def quitar_marca_categoria(sender, instance, **kwargs):
+    facetas.descartar_base()
+    invalidar_catalogo()
+
+
+@receiver(pre_delete, sender=Order)
+def quitar_orden_del_resumen(sender, instance, **kwargs):
+    """Resta la orden del resumen de ventas antes de que se borren sus ítems."""
+    ventas.quitar_orden(instance)
@@ -1,3 +1,147 @@
+from decimal import Decimal
+from unittest import skipUnless
+
+from django.core.cache import cache
+from django.db import connection
 from django.test import TestCase
+from rest_framework.test import APIClient
+
+from .management.commands.explicar_catalogo import CASOS, queryset_de
+from .models import Cart, CartItem, Categoria, CustomUser, Marca, Order, OrderItem, Producto
+from .tokens import tokens_para, version_tokens
+
+
+def crear_productos(n):
+    marca = Marca.objects.create(nombre="Honda")
+    categoria = Categoria.objects.create(nombre="Filtros")
+    return [
+        Producto.objects.create(
+            codigo=f"AB-{i:03d}", nombre_producto=f"Filtro de aceite {i}", descripcion="repuesto original",
+            marca=marca, categoria=categoria, procedencia="Japón",
+            precio_unitario=Decimal(10 + i), stock=10,
+        )
+        for i in range(n)
+    ]
+
+
+class ListadoOrdenesConsultasTests(TestCase):
+    """Los listados de órdenes hacen las mismas consultas con 1 orden que con una página llena."""
+    # COUNT de la paginación, órdenes con su usuario e ítems con su producto.
+    CONSULTAS = 3
+    ORDENES = 20
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.productos = crear_productos(3)
+        cls.cliente = CustomUser.objects.create_user("cliente@example.com", "clave", nombre="Ana")
+        cls.admin = CustomUser.objects.create_superuser("admin@example.com", "clave", nombre="Admin")
+
+    def crear_ordenes(self, n):
+        for _ in range(n):
+            order = Order.objects.create(
+                user=self.cliente, dni="12345678", phone="999999999",
+                address="Av. Siempre Viva 123", city="Lima", state="Lima",
+            )
+            OrderItem.objects.bulk_create(
+                OrderItem(order=order, producto=producto, cantidad=2, price=producto.precio_unitario,
+                          subtotal=2 * producto.precio_unitario)
+                for producto in self.productos
+            )
+
+    def assertConsultasFijas(self, url, usuario):
+        client = APIClient()
+        client.force_authenticate(usuario)
+        for n in (1, self.ORDENES - 1):
+            self.crear_ordenes(n)
+            with self.subTest(ordenes=Order.objects.count()), self.assertNumQueries(self.CONSULTAS):
+                response = client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.data["results"]), Order.objects.count())
+
+    def test_order_list(self):
+        self.assertConsultasFijas("/api/orders/", self.cliente)
+
+    def test_mis_pedidos(self):
+        self.assertConsultasFijas("/api/mis-pedidos/", self.cliente)
+
+    def test_admin_order_list(self):
+        self.assertConsultasFijas("/api/admin/orders/", self.admin)
+
+
+class CarritoConsultasTests(TestCase):
+    """El GET del carrito hace las mismas consultas con 1 ítem que con 100 (ver ``manage.py bench_carrito``)."""
+    # El carrito (get_or_create) y sus ítems con producto y marca.
+    CONSULTAS = 2
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.productos = crear_productos(100)
+
+    def assertConsultasFijas(self, usuario):
+        carrito = Cart.objects.create(usuario=usuario)
+        client = APIClient()
+        # Con el access token, como en producción: el usuario sale de los claims (UsuarioToken).
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {tokens_para(usuario).access_token}")
+        # La versión de los tokens queda en caché desde el primer request del usuario; no se cuenta.
+        cache.clear()
+        version_tokens(usuario.pk)
+        CartItem.objects.create(cart=carrito, producto=self.productos[0], cantidad=1)
+        with self.assertNumQueries(self.CONSULTAS):
+            response = client.get("/api/cart/")
+        self.assertEqual(len(response.data["items"]), 1)
+
+        CartItem.objects.bulk_create(
+            CartItem(cart=carrito, producto=producto, cantidad=2) for producto in self.productos[1:]
+        )
+        with self.assertNumQueries(self.CONSULTAS):
+            response = client.get("/api/cart/")
+        self.assertEqual(len(response.data["items"]), 100)
+
+    def test_carrito_cliente(self):
+        self.assertConsultasFijas(CustomUser.objects.create_user(
+            "cliente@example.com", "clave", puede_ver_precios=True,
+        ))
+
+    def test_carrito_mayoreo(self):
+        self.assertConsultasFijas(CustomUser.objects.create_user(
+            "mayoreo@example.com", "clave", puede_ver_precios=True, puede_ver_precios_mayoreo=True,
+        ))
+
+
+
+class BusquedaCursorTests(TestCase):
+    """Con ``?paginacion=cursor`` la búsqueda recorre todos los empates de relevancia, sin saltar filas."""
+
+    @classmethod
+    def setUpTestData(cls):
+        # Mismo nombre, marca, categoría y descripción: todos empatan en rank para "filtro".
+        cls.productos = crear_productos(7)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_paginas_con_rank_empatado(self):
+        client = APIClient()
+        url = "/api/productos/?search=filtro&paginacion=cursor&page_size=2"
+        vistos = []
+        while url:
+            response = client.get(url)
+            self.assertEqual(response.status_code, 200)
+            vistos += [producto["codigo"] for producto in response.data["results"]]
+            url = response.data["next"]
+        self.assertEqual(sorted(vistos), sorted(p.codigo for p in self.productos))
+        self.assertEqual(len(vistos), len(set(vistos)))
+
+
+@skipUnless(connection.vendor == "postgresql", "Los planes del catálogo se verifican contra PostgreSQL.")
+class PlanesCatalogoTests(TestCase):
+    """Cada consulta del catálogo usa su índice (los mismos casos que ``manage.py explicar_catalogo``)."""
 
-# Create your tests here.
+    def test_consultas_usan_su_indice(self):
+        with connection.cursor() as cursor:
+            # TestCase corre dentro de una transacción: el SET LOCAL no sale de este test.
+            cursor.execute("SET LOCAL enable_seqscan = off")
+        for descripcion, vista, params, usuario, indice, _ in CASOS:
+            with self.subTest(descripcion):
+                plan = queryset_de(vista, params, usuario).explain()
+                self.assertIn(indice, plan, f"{descripcion} no usa {indice}:\n{plan}")
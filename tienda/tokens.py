@@ -0,0 +1,88 @@
+"""
+Tokens JWT con los permisos del usuario y autenticación sin consultar la base.
+
+Al emitir un token se copian en él las banderas que usan el catálogo, el
+carrito y la wishlist (``CLAIMS_USUARIO``) junto con ``token_version``.
+``JWTUsuarioTokenAuthentication`` arma un ``UsuarioToken`` a partir de esos
+claims en vez de cargar el ``CustomUser``; solo compara la versión del token
+con la vigente, que se lee de la caché.
+
+Cuando un admin cambia permisos o bloquea a alguien, ``invalidar_tokens``
+incrementa la versión: los access tokens anteriores se rechazan con 401 y el
+cliente refresca, y el refresh (``CustomTokenRefreshSerializer``) vuelve a
+leer el usuario de la base. Con caché local por proceso, otros workers pueden
+tardar hasta ``VERSION_TTL`` segundos en ver el cambio.
+"""
+from django.core.cache import cache
+from django.db.models import F
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .models import CustomUser
+
+CLAIMS_USUARIO = ("puede_ver_precios", "puede_ver_precios_mayoreo", "is_staff", "is_superuser")
+VERSION_CLAIM = "ver"
+VERSION_TTL = 60
+
+
+def _clave_version(user_id):
+    return f"usuario:{user_id}:token_version"
+
+
+def version_tokens(user_id):
+    """Versión vigente de los tokens del usuario, o None si ya no existe o está inactivo."""
+    clave = _clave_version(user_id)
+    version = cache.get(clave)
+    if version is None:
+        version = (
+            CustomUser.objects.filter(pk=user_id, is_active=True)
+            .values_list("token_version", flat=True)
+            .first()
+        )
+        # -1 cachea también "no existe / inactivo" para no repetir la consulta.
+        cache.set(clave, -1 if version is None else version, VERSION_TTL)
+    return None if version == -1 else version
+
+
+def invalidar_tokens(user):
+    """Invalida todos los access tokens ya emitidos para ``user``."""
+    CustomUser.objects.filter(pk=user.pk).update(token_version=F("token_version") + 1)
+    cache.delete(_clave_version(user.pk))
+
+
+def agregar_claims(token, user):
+    for claim in CLAIMS_USUARIO:
+        token[claim] = bool(getattr(user, claim, False))
+    token[VERSION_CLAIM] = user.token_version
+    return token
+
+
+def tokens_para(user):
+    """RefreshToken (y su access token derivado) con los claims de ``user``."""
+    return agregar_claims(RefreshToken.for_user(user), user)
+
+
+class UsuarioToken(TokenUser):
+    """
+    Usuario armado solo con los claims del token. Los demás atributos (p. ej.
+    ``puede_ver_precios_mayoreo``) se leen del token; para filtrar por usuario
+    en el ORM hay que usar ``usuario_id=request.user.id``.
+    """
+
+
+class JWTUsuarioTokenAuthentication(JWTAuthentication):
+    def get_user(self, validated_token):
+        if VERSION_CLAIM not in validated_token:
+            # Token emitido antes de estos claims: se resuelve como siempre, contra la base.
+            return super().get_user(validated_token)
+
+        user_id = validated_token[api_settings.USER_ID_CLAIM]
+        if version_tokens(user_id) != validated_token[VERSION_CLAIM]:
+            raise InvalidToken({
+                "detail": "Los permisos de la cuenta cambiaron; refresca el token.",
+                "code": "token_desactualizado",
+            })
+        return UsuarioToken(validated_token)
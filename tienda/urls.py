@@ -6,8 +6,8 @@ from rest_framework_simplejwt.views import (
 )
 from .views import (
     AdminBlockUserView, AsignarPrecioMayoreoView,CartDetailView,CartAddProductView,CartUpdateProductView,CartRemoveProductView, MisPedidosView,
-    ProductoCreateView, ProductoDeleteView, ProductoDetailView, ProductoListView, ProductoUpdateView, ProductosRelacionadosView,
-    CartClearView,
+    ProductoCreateView, ProductoDeleteView, ProductoDetailView, ProductoExportView, ProductoFacetasView, ProductoImportView, ProductoListView, ProductoUpdateView, ProductosRelacionadosView,
+    CartClearView, CartBatchView,
 
     RegisterView, RegisterView, LoginView, RequestPasswordResetView, UpdatePricePermissionView, UserInfoView, UserListView, UserProfileView, VerifyCodeView, ResendCodeView,
       CategoriaListAPIView, CategoriaCreateAPIView, CategoriaUpdateAPIView, CategoriaDeleteAPIView,
@@ -19,6 +19,7 @@ from .views import (
     AdminOrderDetailView,
     AdminOrderUpdateView,
     AdminOrderDeleteView,    
+    AdminVentasResumenView,
     PasswordResetValidateTokenView,
     PasswordResetConfirmView,
     CategoriaPublicListView,
@@ -32,10 +33,14 @@ urlpatterns = [
     path("cart/update/<int:producto_id>/", CartUpdateProductView.as_view(), name="cart-update"),
     path('cart/remove/<int:producto_id>/', CartRemoveProductView.as_view(), name='cart-remove'),
     path('cart/clear/', CartClearView.as_view(), name='cart-clear'),
+    path('cart/batch/', CartBatchView.as_view(), name='cart-batch'),        # POST
 
 
     path('productos/', ProductoListView.as_view(), name='producto-list-create'),
     path('productos/create/', ProductoCreateView.as_view(), name='producto-list-create'),
+    path('productos/facetas/', ProductoFacetasView.as_view(), name='producto-facetas'),
+    path('productos/importar/', ProductoImportView.as_view(), name='producto-importar'),
+    path('productos/exportar/', ProductoExportView.as_view(), name='producto-exportar'),
     path('productos/<slug:slug>/', ProductoDetailView.as_view(), name='producto-detail'),
     path('productos/<int:pk>/update/', ProductoUpdateView.as_view(), name='producto-update'),
     path('productos/<int:pk>/delete/', ProductoDeleteView.as_view(), name='producto-delete'),
@@ -82,6 +87,7 @@ urlpatterns = [
     path("admin/orders/<int:pk>/", AdminOrderDetailView.as_view(), name="admin-order-detail"),
     path("admin/orders/<int:pk>/update/", AdminOrderUpdateView.as_view(), name="admin-order-update"),
     path("admin/orders/<int:pk>/delete/", AdminOrderDeleteView.as_view(), name="admin-order-delete"),
+    path("admin/ventas/resumen/", AdminVentasResumenView.as_view(), name="admin-ventas-resumen"),
 
     path("password-reset/validate-token/", PasswordResetValidateTokenView.as_view(), name="password-reset-validate"),
     path("password-reset/confirm/", PasswordResetConfirmView.as_view(), name="password-reset-confirm"),
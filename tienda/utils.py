@@ -2,8 +2,6 @@
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import letter
 from io import BytesIO
-import random
-import string
 
 def generate_order_pdf(order):
     buffer = BytesIO()
@@ -30,12 +28,3 @@ def generate_order_pdf(order):
     buffer.seek(0)
     return buffer
 
-
-# ✅ Nueva función para generar código único de orden
-def generate_unique_order_code():
-    """
-    Genera un código único de pedido con formato ORD-XXXXXX.
-    """
-    prefix = "ORD-"
-    code = ''.join(random.choices(string.ascii_uppercase + string.digits, k=8))
-    return prefix + code
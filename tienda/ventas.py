@@ -0,0 +1,243 @@
+"""
+Resumen de ventas para el dashboard del admin.
+
+``VentaHora`` guarda, por hora de creación de la orden y estado, cuántas
+órdenes hay y la suma de unidades, subtotal y total; ``VentaHoraProducto`` lo
+mismo por producto y categoría. Las tablas se mantienen con deltas: al crear
+una orden se suma su aporte, al cambiar de estado se mueve de un estado al
+otro y al borrarla se resta. Los días se obtienen sumando horas, así que solo
+se escribe una granularidad.
+
+Los deltas se aplican después del commit, cada uno en su propia sentencia,
+para que los checkouts concurrentes no se serialicen esperando el lock de la
+fila de la hora actual. Si algo se desincroniza (p. ej. cambios hechos desde
+el admin de Django), ``manage.py reconstruir_resumen_ventas`` recalcula todo.
+"""
+from datetime import timezone as dt_timezone
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, Count, DecimalField, F, IntegerField, Sum, Value, When
+from django.db.models.functions import Coalesce, TruncDate, TruncHour
+
+from .models import Order, OrderItem, VentaHora, VentaHoraProducto
+
+CERO = Decimal("0.00")
+
+
+def hora_de(fecha):
+    return fecha.astimezone(dt_timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+
+def aporte_orden(order):
+    """Lo que suma una orden al resumen: totales y {producto_id: (categoria_id, unidades, importe)}."""
+    filas = (
+        OrderItem.objects.filter(order=order)
+        .values_list("producto_id", "producto__categoria_id")
+        .annotate(unidades=Sum("cantidad"), importe=Sum("subtotal"))
+        .order_by()
+    )
+    productos = {}
+    unidades = 0
+    for producto_id, categoria_id, cantidad, importe in filas:
+        unidades += cantidad
+        # Los ítems de productos eliminados solo cuentan en los totales.
+        if producto_id is not None:
+            productos[producto_id] = (categoria_id, cantidad, importe)
+    return {
+        "hora": hora_de(order.created_at),
+        "subtotal": order.subtotal,
+        "total": order.total,
+        "unidades": unidades,
+        "productos": productos,
+    }
+
+
+def _aplicar(aporte, status, signo):
+    hora = aporte["hora"]
+    VentaHora.objects.bulk_create([VentaHora(hora=hora, status=status)], ignore_conflicts=True)
+    VentaHora.objects.filter(hora=hora, status=status).update(
+        pedidos=F("pedidos") + signo,
+        unidades=F("unidades") + signo * aporte["unidades"],
+        subtotal=F("subtotal") + signo * aporte["subtotal"],
+        total=F("total") + signo * aporte["total"],
+    )
+
+    productos = aporte["productos"]
+    if not productos:
+        return
+    VentaHoraProducto.objects.bulk_create(
+        [
+            VentaHoraProducto(hora=hora, status=status, producto_id=producto_id, categoria_id=categoria_id)
+            for producto_id, (categoria_id, _, _) in productos.items()
+        ],
+        ignore_conflicts=True,
+    )
+    # Un solo UPDATE para todos los productos de la orden.
+    VentaHoraProducto.objects.filter(hora=hora, status=status, producto_id__in=productos).update(
+        unidades=F("unidades") + Case(
+            *[When(producto_id=pid, then=Value(signo * u)) for pid, (_, u, _) in productos.items()],
+            output_field=IntegerField(),
+        ),
+        importe=F("importe") + Case(
+            *[When(producto_id=pid, then=Value(signo * i)) for pid, (_, _, i) in productos.items()],
+            output_field=DecimalField(max_digits=14, decimal_places=2),
+        ),
+    )
+
+
+def registrar_orden(order):
+    aporte = aporte_orden(order)
+    status = order.status
+    transaction.on_commit(lambda: _aplicar(aporte, status, 1))
+
+
+def mover_orden(order, anterior, nuevo):
+    if anterior == nuevo:
+        return
+    aporte = aporte_orden(order)
+
+    def mover():
+        _aplicar(aporte, anterior, -1)
+        _aplicar(aporte, nuevo, 1)
+
+    transaction.on_commit(mover)
+
+
+def quitar_orden(order):
+    """Debe llamarse antes de borrar la orden, mientras sus ítems existen."""
+    aporte = aporte_orden(order)
+    status = order.status
+    transaction.on_commit(lambda: _aplicar(aporte, status, -1))
+
+
+def reconstruir():
+    """Recalcula ambas tablas desde Order/OrderItem. Retorna (filas, filas_producto)."""
+    ordenes = (
+        Order.objects.annotate(h=TruncHour("created_at", tzinfo=dt_timezone.utc))
+        .values("h", "status")
+        .annotate(
+            n=Count("id"),
+            sub=Coalesce(Sum("subtotal"), CERO),
+            tot=Coalesce(Sum("total"), CERO),
+        )
+        .order_by()
+    )
+    unidades = (
+        OrderItem.objects.annotate(h=TruncHour("order__created_at", tzinfo=dt_timezone.utc))
+        .values("h", "order__status", "producto_id", "producto__categoria_id")
+        .annotate(u=Sum("cantidad"), imp=Sum("subtotal"))
+        .order_by()
+    )
+
+    unidades_por_hora = {}
+    por_producto = []
+    for fila in unidades:
+        clave = (fila["h"], fila["order__status"])
+        unidades_por_hora[clave] = unidades_por_hora.get(clave, 0) + fila["u"]
+        if fila["producto_id"] is not None:
+            por_producto.append(VentaHoraProducto(
+                hora=fila["h"], status=fila["order__status"],
+                producto_id=fila["producto_id"], categoria_id=fila["producto__categoria_id"],
+                unidades=fila["u"], importe=fila["imp"],
+            ))
+
+    filas = [
+        VentaHora(
+            hora=f["h"], status=f["status"], pedidos=f["n"],
+            unidades=unidades_por_hora.get((f["h"], f["status"]), 0),
+            subtotal=f["sub"], total=f["tot"],
+        )
+        for f in ordenes
+    ]
+
+    with transaction.atomic():
+        VentaHora.objects.all().delete()
+        VentaHoraProducto.objects.all().delete()
+        VentaHora.objects.bulk_create(filas, batch_size=1000)
+        VentaHoraProducto.objects.bulk_create(por_producto, batch_size=1000)
+    return len(filas), len(por_producto)
+
+
+def _formato(valor):
+    return f"{(valor or CERO):.2f}"
+
+
+def serie(desde, hasta, agrupar="dia", estados=None, tz=None):
+    """
+    Lista de periodos (hora o día en ``tz``) con las métricas de cada estado,
+    leída solo de ``VentaHora``. ``desde`` inclusive, ``hasta`` exclusivo.
+    """
+    filas = VentaHora.objects.filter(hora__gte=desde, hora__lt=hasta)
+    if estados:
+        filas = filas.filter(status__in=estados)
+    if agrupar == "dia":
+        filas = filas.annotate(periodo=TruncDate("hora", tzinfo=tz))
+    else:
+        filas = filas.annotate(periodo=F("hora"))
+    filas = (
+        filas.values("periodo", "status")
+        .annotate(
+            pedidos=Sum("pedidos"), unidades=Sum("unidades"),
+            subtotal=Sum("subtotal"), total=Sum("total"),
+        )
+        .order_by("periodo", "status")
+    )
+
+    periodos = {}
+    totales = {}
+    for fila in filas:
+        if not fila["pedidos"]:
+            # Filas que quedaron en cero tras mover órdenes a otro estado.
+            continue
+        metricas = {
+            "pedidos": fila["pedidos"],
+            "unidades": fila["unidades"],
+            "subtotal": fila["subtotal"] or CERO,
+            "total": fila["total"] or CERO,
+        }
+        periodo = periodos.setdefault(fila["periodo"], {})
+        periodo[fila["status"]] = metricas
+        acumulado = totales.setdefault(fila["status"], dict.fromkeys(metricas, 0))
+        for campo, valor in metricas.items():
+            acumulado[campo] += valor
+
+    def formatear(metricas):
+        return {**metricas, "subtotal": _formato(metricas["subtotal"]), "total": _formato(metricas["total"])}
+
+    return {
+        "series": [
+            {
+                "periodo": periodo.isoformat(),
+                "status": {status: formatear(m) for status, m in por_status.items()},
+            }
+            for periodo, por_status in periodos.items()
+        ],
+        "totales": {status: formatear(m) for status, m in totales.items()},
+    }
+
+
+def ranking(desde, hasta, por="producto", estados=None, limite=20):
+    """Productos o categorías con más importe vendido en el rango, desde ``VentaHoraProducto``."""
+    campos = {
+        "producto": ("producto_id", "producto__nombre_producto"),
+        "categoria": ("categoria_id", "categoria__nombre"),
+    }[por]
+    filas = VentaHoraProducto.objects.filter(hora__gte=desde, hora__lt=hasta)
+    if estados:
+        filas = filas.filter(status__in=estados)
+    filas = (
+        filas.values(*campos)
+        .annotate(unidades=Sum("unidades"), importe=Sum("importe"))
+        .filter(unidades__gt=0)
+        .order_by("-importe", campos[0])[:limite]
+    )
+    return [
+        {
+            "id": fila[campos[0]],
+            "nombre": fila[campos[1]],
+            "unidades": fila["unidades"],
+            "importe": _formato(fila["importe"]),
+        }
+        for fila in filas
+    ]
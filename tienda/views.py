@@ -1,20 +1,19 @@
 from django.utils.http import urlsafe_base64_decode
 from django.utils import timezone
 from datetime import timedelta
-from django.core.mail import send_mail
 from django.contrib.auth import authenticate, get_user_model
 from django.shortcuts import get_object_or_404
 from rest_framework import generics, status, filters, permissions
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.permissions import AllowAny, IsAuthenticated, IsAdminUser
-from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework_simplejwt.authentication import JWTAuthentication
 import random
 from .models import (
     Producto,
     CustomUser,
     Cart,
+    CartItem,
     PendingUser,
     Marca,
     Categoria,
@@ -23,22 +22,23 @@ from .models import (
     OrderItem
 )
 from django.db.models import F
-from django.db.models.functions import Coalesce
 from django.contrib.auth.tokens import PasswordResetTokenGenerator
 from django.utils.encoding import force_bytes
 from .serializers import (
     ProductoSerializer,
+    ProductoCatalogoSerializer,
     UserRegisterSerializer,
     CartSerializer,
+    CartOperacionSerializer,
     CustomUserSerializer,
     MarcaSerializer,
     CategoriaSerializer,
     OrderSerializer,
     WishlistSerializer
 )
-from rest_framework.exceptions import PermissionDenied
+from rest_framework.exceptions import PermissionDenied, ValidationError as DRFValidationError
 from django.core.exceptions import ValidationError
-from django.db.models import Q
+from django.db.models import Q, Prefetch, prefetch_related_objects
 from rest_framework.parsers import MultiPartParser, FormParser
 User = get_user_model()
 from django.contrib.auth.tokens import PasswordResetTokenGenerator
@@ -50,7 +50,22 @@ from urllib.parse import urlencode
 from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
 import logging
 from django.conf import settings
-from .paginations import ProductPagination
+from .paginations import OrderPagination, ProductPagination, ProductKeysetPagination
+from .search import ProductoSearchFilter, buscar_productos
+from .facetas import facetas_catalogo
+from .importacion import ImportadorProductos, leer_archivo
+from .exportacion import exportar_csv, exportar_ndjson, filas_exportacion
+from .inventario import StockInsuficiente, descontar_stock_orden, devolver_stock_orden
+from . import ventas
+from .correo import enviar_plantilla
+from . import limites
+from .backends import actualizar_hash
+from .tokens import JWTUsuarioTokenAuthentication, invalidar_tokens, tokens_para
+from django.db import transaction
+from django.http import StreamingHttpResponse
+from django.utils.dateparse import parse_date, parse_datetime
+from datetime import datetime
+from .cache import IdempotenciaMixin, RespuestaCacheadaMixin, conteo_cacheado, estimar_filas
 logger = logging.getLogger(__name__)
 class RegisterView(APIView):
     permission_classes = [AllowAny]
@@ -160,52 +175,7 @@ def enviar_codigo_verificacion(email):
     pending_user.code_expires_at = timezone.now() + timedelta(minutes=10)
     pending_user.save()
 
-
-    html_message = f"""
-    <div style="font-family:'Arial',sans-serif; text-align:center; background:#f5f5f5; padding:50px;">
-        <div style="position:relative; max-width:600px; margin:auto; background:#ffffff; border-radius:20px; overflow:hidden; box-shadow:0 20px 50px rgba(0,0,0,0.15); padding:50px 20px;">
-
-            <!-- Iconos flotantes -->
-            <span style="position:absolute; top:-10px; left:10%; font-size:24px; animation:floatA 6s ease-in-out infinite;">🔧</span>
-            <span style="position:absolute; top:20%; right:-10px; font-size:28px; animation:floatB 7s ease-in-out infinite;">🛵</span>
-            <span style="position:absolute; bottom:-10px; left:25%; font-size:24px; animation:floatC 5s ease-in-out infinite;">🛠️</span>
-            <span style="position:absolute; bottom:15%; right:15%; font-size:22px; animation:floatD 8s ease-in-out infinite;">⚙️</span>
-            <span style="position:absolute; top:50%; left:-10px; font-size:26px; animation:floatE 6s ease-in-out infinite;">🔩</span>
-
-            <h2 style="font-size:28px; margin-bottom:20px; color:#2c3e50;">¡Verifica tu correo!</h2>
-            <p style="font-size:16px; line-height:1.6; color:#34495e;">Gracias por registrarte en <strong>MOTOREPUESTO DAVILA</strong>, tu tienda de repuestos de moto. Usa el siguiente código para completar tu registro:</p>
-            
-            <div style="font-size:42px; font-weight:bold; margin:30px 0; color:#c0392b; background:#ecf0f1; padding:25px; border-radius:12px; display:inline-block; letter-spacing:2px; border:2px dashed #f39c12;">
-                {codigo}
-            </div>
-
-            <p style="font-size:14px; color:#7f8c8d; margin-top:15px;">Este código expirará en 10 minutos.</p>
-            <p style="margin-top:10px; font-size:13px; color:#95a5a6;">Si no solicitaste este correo, ignóralo.</p>
-
-            <div style="background:#ecf0f1; padding:15px; margin-top:30px; border-radius:10px; font-size:12px; color:#95a5a6;">
-                <span style="margin:0 5px;">🔧</span>
-                <span style="margin:0 5px;">🛠️</span>
-                <span style="margin:0 5px;">🛵</span>
-                <span style="margin:0 5px;">⚙️</span>
-                <p style="margin-top:10px;">© 2025 MOTOREPUESTO DAVILA - Repuestos de moto. Todos los derechos reservados.</p>
-            </div>
-        </div>
-
-    </div>
-    """
-
-    try:
-        send_mail(
-            subject="Código de verificación - Davila Tienda",
-            message=f"Tu código de verificación es: {codigo}",
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[email],
-            html_message=html_message,
-            fail_silently=False,
-        )
-    except Exception as e:
-            logger.error(f"Error enviando correo de verificación a {email}: {e}")
-            return None
+    enviar_plantilla("verificacion", email, codigo=codigo)
 
     return codigo
 
@@ -243,13 +213,6 @@ class ResendCodeView(APIView):
         peding.resend_count += 1
         peding.save()
 
-        send_mail(
-            "Nuevo código de verificación",
-            f"Tu nuevo código es: {new_code}",
-            "no-reply@tuservidor.com",
-            [peding.email],
-            fail_silently=False,
-        )
         return Response(
             {"message": "Nuevo código enviado correctamente."},
             status=status.HTTP_200_OK,
@@ -258,14 +221,51 @@ class ResendCodeView(APIView):
 
 
 
-class ProductoListView(generics.ListAPIView):
-    serializer_class = ProductoSerializer
+class ProductoListView(RespuestaCacheadaMixin, generics.ListAPIView):
+    serializer_class = ProductoCatalogoSerializer
+    authentication_classes = [JWTUsuarioTokenAuthentication]
     permission_classes = [AllowAny]
     pagination_class = ProductPagination
-    filter_backends = [filters.SearchFilter]
-    search_fields = ['nombre_producto', 'descripcion', 'categoria__nombre', 'marca__nombre']
-
-    def get_queryset(self):
+    filter_backends = [ProductoSearchFilter]
+
+    @property
+    def paginator(self):
+        """``?paginacion=cursor`` activa la paginación keyset (sin OFFSET ni COUNT)."""
+        if not hasattr(self, '_paginator'):
+            if self.request.query_params.get('paginacion') == 'cursor':
+                self._paginator = ProductKeysetPagination()
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
+
+    def get_filtros(self):
+        """Filtros del request normalizados; sirven como clave de caché."""
+        params = self.request.query_params
+        user = self.request.user
+        return {
+            'categoria': params.get('categoria', '').strip().lower(),
+            'marca': params.get('marca', '').strip().lower(),
+            'procedencia': params.get('procedencia', '').strip().lower(),
+            'min': params.get('min', '').strip(),
+            'max': params.get('max', '').strip(),
+            'search': ' '.join(params.get('search', '').lower().split()),
+            'mayoreo': bool(user.is_authenticated and getattr(user, 'puede_ver_precios_mayoreo', False)),
+        }
+
+    def get_total_count(self, queryset):
+        """
+        Total de productos para el paginador. Con ``?conteo=estimado`` y sin
+        búsqueda de texto se usa la estimación del planificador de PostgreSQL.
+        """
+        filtros = self.get_filtros()
+        if self.request.query_params.get('conteo') == 'estimado' and not filtros['search']:
+            estimado = estimar_filas(queryset)
+            if estimado is not None:
+                return estimado
+        return conteo_cacheado(queryset, filtros)
+
+    def get_precio_queryset(self):
+        """Productos con ``precio_efectivo`` según el usuario, filtrados por min/max."""
         user = self.request.user
         ve_mayoreo = user.is_authenticated and getattr(user, 'puede_ver_precios_mayoreo', False)
 
@@ -273,18 +273,29 @@ class ProductoListView(generics.ListAPIView):
 
         if ve_mayoreo:
             queryset = queryset.annotate(
-                precio_efectivo=Coalesce('precio_mayoreo', 'precio_unitario')
+                precio_efectivo=F('precio_mayoreo_efectivo')
             )
         else:
             queryset = queryset.annotate(
                 precio_efectivo=F('precio_unitario')
             )
 
+        min_price = self.request.query_params.get('min')
+        max_price = self.request.query_params.get('max')
+
+        if min_price:
+            queryset = queryset.filter(precio_efectivo__gte=min_price)
+        if max_price:
+            queryset = queryset.filter(precio_efectivo__lte=max_price)
+
+        return queryset
+
+    def get_queryset(self):
+        queryset = self.get_precio_queryset()
+
         categoria = self.request.query_params.get('categoria')
         marca = self.request.query_params.get('marca')
         procedencia = self.request.query_params.get('procedencia')
-        min_price = self.request.query_params.get('min')
-        max_price = self.request.query_params.get('max')
         sort = self.request.query_params.get('sort')
 
         if categoria:
@@ -298,28 +309,93 @@ class ProductoListView(generics.ListAPIView):
         if procedencia:
             queryset = queryset.filter(procedencia__icontains=procedencia)
 
-        if min_price:
-            queryset = queryset.filter(precio_efectivo__gte=min_price)
-        if max_price:
-            queryset = queryset.filter(precio_efectivo__lte=max_price)
-
         if sort == 'price-asc':
-            queryset = queryset.order_by('precio_efectivo')
+            queryset = queryset.order_by('precio_efectivo', 'id')
         elif sort == 'price-desc':
-            queryset = queryset.order_by('-precio_efectivo')
+            queryset = queryset.order_by('-precio_efectivo', '-id')
         else:
-            queryset = queryset.order_by('-fecha_registro')
+            queryset = queryset.order_by('-fecha_registro', '-id')
 
         return queryset
 
+class ProductoFacetasView(ProductoListView):
+    """
+    Conteos por categoría, marca y procedencia y rango de precios para los
+    filtros actuales, en una sola consulta agrupada. Para el sidebar de la tienda.
+    """
+
+    def list(self, request, *args, **kwargs):
+        filtros = self.get_filtros()
+        queryset = buscar_productos(self.get_precio_queryset(), filtros['search'])
+        return Response(facetas_catalogo(queryset, filtros))
+
+class ProductoImportView(APIView):
+    """
+    Importa un CSV/XLSX de productos (campo ``archivo``), haciendo upsert por código.
+    """
+    permission_classes = [IsAdminUser]
+    parser_classes = [MultiPartParser, FormParser]
+
+    def post(self, request):
+        archivo = request.FILES.get("archivo")
+        if not archivo:
+            return Response({"error": "Debes enviar el archivo en el campo 'archivo'."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        crear = str(request.data.get("crear_faltantes", "true")).lower() not in ("false", "0")
+        importador = ImportadorProductos(crear_faltantes=crear)
+        try:
+            resultado = importador.importar(leer_archivo(archivo, archivo.name))
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(resultado, status=status.HTTP_200_OK)
+
+class ProductoExportView(APIView):
+    """
+    Exporta todo el catálogo en streaming. ``?formato=csv`` (por defecto) o
+    ``ndjson``; ``?updated_since=`` (fecha o fecha y hora ISO) para sincronizar
+    solo lo modificado desde la última corrida.
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        formato = request.query_params.get("formato", "csv")
+        if formato not in ("csv", "ndjson"):
+            return Response({"error": "Formato no soportado. Usa 'csv' o 'ndjson'."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        desde = request.query_params.get("updated_since")
+        actualizado_desde = None
+        if desde:
+            try:
+                actualizado_desde = parse_datetime(desde)
+                if actualizado_desde is None and parse_date(desde):
+                    actualizado_desde = datetime.combine(parse_date(desde), datetime.min.time())
+            except ValueError:
+                actualizado_desde = None
+            if actualizado_desde is None:
+                return Response({"error": "updated_since debe ser una fecha ISO 8601."},
+                                status=status.HTTP_400_BAD_REQUEST)
+            if timezone.is_naive(actualizado_desde):
+                actualizado_desde = timezone.make_aware(actualizado_desde)
+
+        filas = filas_exportacion(actualizado_desde)
+        if formato == "ndjson":
+            response = StreamingHttpResponse(exportar_ndjson(filas), content_type="application/x-ndjson")
+        else:
+            response = StreamingHttpResponse(exportar_csv(filas), content_type="text/csv; charset=utf-8")
+        response["Content-Disposition"] = f'attachment; filename="productos.{formato}"'
+        return response
+
 class ProductoCreateView(generics.CreateAPIView):
     queryset = Producto.objects.all()
     serializer_class = ProductoSerializer
     permission_classes = [IsAdminUser]  
 
-class ProductoDetailView(generics.RetrieveAPIView):
-    queryset = Producto.objects.all()
+class ProductoDetailView(RespuestaCacheadaMixin, generics.RetrieveAPIView):
+    queryset = Producto.objects.select_related('categoria', 'marca')
     serializer_class = ProductoSerializer
+    authentication_classes = [JWTUsuarioTokenAuthentication]
     permission_classes = [AllowAny]  
     lookup_field = 'slug'  
 
@@ -358,30 +434,44 @@ class ProductoDestacadoListView(generics.ListAPIView):
             )
         return queryset.order_by('-fecha_registro')
 
+def carrito_con_items(carrito):
+    """Carga ítems, producto y marca en una sola consulta para ``CartSerializer``."""
+    prefetch_related_objects([carrito], Prefetch(
+        "items", queryset=CartItem.objects.select_related("producto__marca").order_by("id")
+    ))
+    return carrito
+
 class CartDetailView(generics.RetrieveAPIView):
     serializer_class = CartSerializer
+    authentication_classes = [JWTUsuarioTokenAuthentication]
     permission_classes = [permissions.IsAuthenticated]
     def get_object(self):
-        carrito, created = Cart.objects.get_or_create(usuario=self.request.user, activo=True)
-        return carrito
+        carrito, created = Cart.objects.get_or_create(usuario_id=self.request.user.id, activo=True)
+        return carrito_con_items(carrito)
     
 class CartAddProductView(generics.GenericAPIView):
     serializer_class = CartSerializer
+    authentication_classes = [JWTUsuarioTokenAuthentication]
     permission_classes = [permissions.IsAuthenticated]
 
     def post(self, request, *args, **kwargs):
         producto_id = request.data.get("producto_id")
-        cantidad = int(request.data.get("cantidad", 1))
+        try:
+            cantidad = int(request.data.get("cantidad", 1))
+        except (ValueError, TypeError):
+            return Response({"detail": "Cantidad inválida."}, status=status.HTTP_400_BAD_REQUEST)
+        if cantidad < 1:
+            return Response({"detail": "La cantidad debe ser al menos 1."}, status=status.HTTP_400_BAD_REQUEST)
 
         try:
             producto = Producto.objects.get(id=producto_id)
         except Producto.DoesNotExist:
             return Response({"detail": "Producto no encontrado."}, status=status.HTTP_404_NOT_FOUND)
 
-        carrito, created = Cart.objects.get_or_create(usuario=request.user, activo=True)
+        carrito, created = Cart.objects.get_or_create(usuario_id=request.user.id, activo=True)
 
         carrito.add_producto(producto, cantidad)
-        serializer = self.get_serializer(carrito, context={"request": request})
+        serializer = self.get_serializer(carrito_con_items(carrito))
         return Response(serializer.data, status=status.HTTP_201_CREATED)
     
 from rest_framework import generics
@@ -391,11 +481,12 @@ from .models import Producto
 from .serializers import ProductoSerializer
 
 class ProductosRelacionadosView(generics.GenericAPIView):
-    serializer_class = ProductoSerializer
+    serializer_class = ProductoCatalogoSerializer
+    authentication_classes = [JWTUsuarioTokenAuthentication]
     permission_classes = [AllowAny]
 
     def get(self, request, categoria, producto_id=None):
-        queryset = Producto.objects.filter(categoria_id=categoria)
+        queryset = Producto.objects.select_related('categoria', 'marca').filter(categoria_id=categoria)
         if producto_id:
             queryset = queryset.exclude(id=producto_id)
         queryset = queryset.order_by('-fecha_registro')[:8]
@@ -404,6 +495,7 @@ class ProductosRelacionadosView(generics.GenericAPIView):
 
 class CartUpdateProductView(generics.GenericAPIView):
     serializer_class = CartSerializer
+    authentication_classes = [JWTUsuarioTokenAuthentication]
     permission_classes = [permissions.IsAuthenticated]
     def put(self, request, producto_id, *args, **kwargs):
         return self.update_cart(request, producto_id)
@@ -421,7 +513,7 @@ class CartUpdateProductView(generics.GenericAPIView):
             return Response({"detail": "Cantidad inválida."},
                             status=status.HTTP_400_BAD_REQUEST)
 
-        cart = Cart.objects.filter(usuario=request.user, activo=True).first()
+        cart = Cart.objects.filter(usuario_id=request.user.id, activo=True).first()
         if not cart:
             return Response({"detail": "Carrito no encontrado."},
                             status=status.HTTP_404_NOT_FOUND)
@@ -432,40 +524,70 @@ class CartUpdateProductView(generics.GenericAPIView):
                             status=status.HTTP_404_NOT_FOUND)
 
         cart.update_cantidad(producto, cantidad)
-        serializer = self.get_serializer(cart, context={"request": request})
+        serializer = self.get_serializer(carrito_con_items(cart))
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 class CartRemoveProductView(generics.DestroyAPIView):
+    authentication_classes = [JWTUsuarioTokenAuthentication]
     permission_classes = [permissions.IsAuthenticated]
     def delete(self, request, producto_id, *args, **kwargs):
-        cart, _ = Cart.objects.get_or_create(usuario=request.user, activo=True)
+        cart, _ = Cart.objects.get_or_create(usuario_id=request.user.id, activo=True)
 
         try:
             producto = Producto.objects.get(id=producto_id)
         except Producto.DoesNotExist:
             return Response({"detail": "Producto no encontrado."}, status=status.HTTP_404_NOT_FOUND)
 
-        item = cart.items.filter(producto=producto).first()
-        if not item:
+        if not cart.remove_producto(producto):
             return Response({"detail": "El producto ya no estaba en el carrito."}, status=status.HTTP_200_OK)
 
-        item.delete()
         return Response({"detail": "Producto eliminado del carrito."}, status=status.HTTP_200_OK)
 
 class CartClearView(APIView):
     """
     Vacía completamente el carrito del usuario autenticado.
     """
+    authentication_classes = [JWTUsuarioTokenAuthentication]
     permission_classes = [permissions.IsAuthenticated]
 
     def delete(self, request, *args, **kwargs):
         try:
-            cart, created = Cart.objects.get_or_create(usuario=request.user, activo=True)
+            cart, created = Cart.objects.get_or_create(usuario_id=request.user.id, activo=True)
             cart.items.all().delete()
             return Response({"message": "Carrito vaciado correctamente"}, status=status.HTTP_200_OK)
         except Exception as e:
             return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
         
+class CartBatchView(generics.GenericAPIView):
+    """
+    Varias operaciones sobre el carrito en un solo request:
+    ``[{"producto_id": 1, "cantidad": 2, "op": "add"}, ...]`` con ``op`` en
+    add/update/remove. Se aplican todas o ninguna y el carrito se serializa una vez.
+    """
+    serializer_class = CartSerializer
+    authentication_classes = [JWTUsuarioTokenAuthentication]
+    permission_classes = [permissions.IsAuthenticated]
+    max_operaciones = 200
+
+    def post(self, request, *args, **kwargs):
+        operaciones = CartOperacionSerializer(
+            data=request.data, many=True, allow_empty=False, max_length=self.max_operaciones
+        )
+        operaciones.is_valid(raise_exception=True)
+        operaciones = operaciones.validated_data
+
+        ids = {op["producto_id"] for op in operaciones}
+        existentes = set(Producto.objects.filter(id__in=ids).values_list("id", flat=True))
+        faltantes = sorted(ids - existentes)
+        if faltantes:
+            return Response({"detail": "Producto no encontrado.", "producto_id": faltantes},
+                            status=status.HTTP_404_NOT_FOUND)
+
+        carrito, _ = Cart.objects.get_or_create(usuario_id=request.user.id, activo=True)
+        carrito.aplicar_operaciones(operaciones)
+        serializer = self.get_serializer(carrito_con_items(carrito))
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
 class CategoriaListAPIView(generics.ListAPIView):
     queryset = Categoria.objects.all()
     serializer_class = CategoriaSerializer
@@ -544,6 +666,7 @@ class UpdatePricePermissionView(APIView):
 
         user.puede_ver_precios = bool(puede_ver)
         user.save()
+        invalidar_tokens(user)
         return Response({"message": f"Permiso actualizado correctamente para {user.email}."})
     
 class AsignarPrecioMayoreoView(generics.UpdateAPIView):
@@ -557,6 +680,7 @@ class AsignarPrecioMayoreoView(generics.UpdateAPIView):
         if puede_ver is not None:
             user.puede_ver_precios_mayoreo = bool(puede_ver)
             user.save()
+            invalidar_tokens(user)
             return Response({
                 "id": user.id,
                 "puede_ver_precios": user.puede_ver_precios_mayoreo,
@@ -566,43 +690,45 @@ class AsignarPrecioMayoreoView(generics.UpdateAPIView):
 class LoginView(APIView):
     permission_classes = [AllowAny]
 
-    MAX_ATTEMPTS = 3
-    BLOCK_MINUTES = 15
-
     def post(self, request):
         email = request.data.get("email")
         password = request.data.get("password")
+        ip = limites.ip_cliente(request)
 
-        user = User.objects.filter(email=email).first()
-
-        if user and not user.is_active:
+        # Los bloqueos se revisan antes de cualquier consulta o cálculo de hash.
+        regla, segundos = limites.bloqueo_login(email, ip)
+        if regla is limites.POR_EMAIL:
+            hasta = timezone.now() + timedelta(seconds=segundos)
             return Response(
-                {"detail": "Usuario bloqueado. Comuníquese con soporte."},
+                {"detail": f"Usuario bloqueado hasta {hasta.strftime('%H:%M:%S')}"},
                 status=status.HTTP_403_FORBIDDEN
             )
-
-        if user and user.blocked_until and user.blocked_until > timezone.now():
-            return Response(
-                {"detail": f"Usuario bloqueado hasta {user.blocked_until.strftime('%H:%M:%S')}"},
-                status=status.HTTP_403_FORBIDDEN
+        if regla is limites.POR_IP:
+            response = Response(
+                {"detail": "Demasiados intentos fallidos desde esta conexión. Intenta más tarde."},
+                status=status.HTTP_429_TOO_MANY_REQUESTS
             )
+            response["Retry-After"] = str(segundos)
+            return response
 
         auth_user = authenticate(request, email=email, password=password)
 
         if not auth_user:
-            if user:
-                user.failed_login_attempts += 1
-                if user.failed_login_attempts >= self.MAX_ATTEMPTS:
-                    user.blocked_until = timezone.now() + timedelta(minutes=self.BLOCK_MINUTES)
-                    user.failed_login_attempts = 0
-                user.save()
+            # authenticate() rechaza a los inactivos; solo en el camino de error se distingue el caso.
+            if email and User.objects.filter(email=email, is_active=False).exists():
+                return Response(
+                    {"detail": "Usuario bloqueado. Comuníquese con soporte."},
+                    status=status.HTTP_403_FORBIDDEN
+                )
+            limites.registrar_fallo(email, ip)
             return Response({"detail": "Credenciales inválidas."}, status=status.HTTP_401_UNAUTHORIZED)
 
-        user.failed_login_attempts = 0
-        user.blocked_until = None
-        user.save()
+        # Camino común sin escrituras: solo se toca algo si había fallos o el hash quedó viejo.
+        limites.registrar_exito(email)
+        if actualizar_hash(auth_user, password):
+            logger.info("Hash de contraseña actualizado para el usuario %s", auth_user.pk)
 
-        refresh = RefreshToken.for_user(auth_user)
+        refresh = tokens_para(auth_user)
         access_token = str(refresh.access_token)
         refresh_token = str(refresh)
 
@@ -642,10 +768,11 @@ class WishlistListView(generics.ListAPIView):
     Retorna todos los productos en la wishlist del usuario autenticado.
     """
     serializer_class = WishlistSerializer
+    authentication_classes = [JWTUsuarioTokenAuthentication]
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        return Wishlist.objects.filter(usuario=self.request.user).select_related("producto")
+        return Wishlist.objects.filter(usuario_id=self.request.user.id).select_related("producto")
 
 
 class WishlistCreateView(generics.CreateAPIView):
@@ -654,20 +781,23 @@ class WishlistCreateView(generics.CreateAPIView):
     """
     queryset = Wishlist.objects.all()
     serializer_class = WishlistSerializer
+    authentication_classes = [JWTUsuarioTokenAuthentication]
     permission_classes = [permissions.IsAuthenticated]
 
     def perform_create(self, serializer):
-        serializer.save(usuario=self.request.user)
+        # WishlistSerializer.create asigna el usuario del request.
+        serializer.save()
 
 
 class WishlistDeleteView(generics.DestroyAPIView):
     """
     Elimina un producto de la wishlist del usuario autenticado.
     """
+    authentication_classes = [JWTUsuarioTokenAuthentication]
     permission_classes = [permissions.IsAuthenticated]
     def delete(self, request, pk, *args, **kwargs):
         try:
-            wishlist_item = Wishlist.objects.get(usuario=request.user, producto_id=pk)
+            wishlist_item = Wishlist.objects.get(usuario_id=request.user.id, producto_id=pk)
             wishlist_item.delete()
             return Response({"detail": "Producto eliminado de la wishlist."},
                             status=status.HTTP_204_NO_CONTENT)
@@ -677,17 +807,76 @@ class WishlistDeleteView(generics.DestroyAPIView):
                 status=status.HTTP_404_NOT_FOUND
             )
 
-class OrderListView(generics.ListAPIView):
+def fecha_param(request, nombre):
+    """``?nombre=AAAA-MM-DD`` como inicio de ese día en la zona horaria del sitio, o None."""
+    valor = request.query_params.get(nombre, "").strip()
+    if not valor:
+        return None
+    try:
+        fecha = parse_date(valor)
+    except ValueError:
+        fecha = None
+    if fecha is None:
+        raise DRFValidationError({nombre: "Fecha inválida, usa el formato AAAA-MM-DD."})
+    return timezone.make_aware(datetime.combine(fecha, datetime.min.time()))
+
+
+def estados_param(request):
+    """``?status=a,b`` validado contra ``Order.STATUS_CHOICES``."""
+    estados = [e.strip() for e in request.query_params.get("status", "").split(",") if e.strip()]
+    invalidos = [e for e in estados if e not in dict(Order.STATUS_CHOICES)]
+    if invalidos:
+        raise DRFValidationError({"status": f"Estado inválido: {', '.join(invalidos)}."})
+    return estados
+
+
+def ordenes_con_detalle(queryset):
+    """Usuario e ítems con su producto en dos consultas fijas, sin importar cuántas órdenes haya."""
+    return queryset.select_related("user").prefetch_related(
+        Prefetch("items", queryset=OrderItem.objects.select_related("producto").order_by("id"))
+    )
+
+
+class OrderListMixin:
     """
-    GET: Lista todas las órdenes del usuario autenticado.
+    Listado paginado de órdenes con filtros opcionales:
+    ``?status=pending,processing``, ``?desde=AAAA-MM-DD`` y ``?hasta=AAAA-MM-DD``
+    (ambas fechas inclusive, en la zona horaria del sitio).
     """
     serializer_class = OrderSerializer
-    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = OrderPagination
+
+    def get_ordenes(self):
+        return Order.objects.all()
 
     def get_queryset(self):
-        return Order.objects.filter(user=self.request.user).order_by("-created_at")
+        queryset = self.get_ordenes()
+
+        estados = estados_param(self.request)
+        if estados:
+            queryset = queryset.filter(status__in=estados)
+
+        # Rangos sobre created_at (no created_at__date) para que use el índice.
+        desde = fecha_param(self.request, "desde")
+        hasta = fecha_param(self.request, "hasta")
+        if desde:
+            queryset = queryset.filter(created_at__gte=desde)
+        if hasta:
+            queryset = queryset.filter(created_at__lt=hasta + timedelta(days=1))
+
+        return ordenes_con_detalle(queryset).order_by("-created_at", "-id")
+
+
+class OrderListView(OrderListMixin, generics.ListAPIView):
+    """
+    GET: Lista todas las órdenes del usuario autenticado.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_ordenes(self):
+        return Order.objects.filter(user=self.request.user)
     
-class OrderCreateView(generics.CreateAPIView):
+class OrderCreateView(IdempotenciaMixin, generics.CreateAPIView):
     serializer_class = OrderSerializer
     permission_classes = [permissions.IsAuthenticated]
     def create(self, request, *args, **kwargs):
@@ -699,6 +888,9 @@ class OrderCreateView(generics.CreateAPIView):
         except ValidationError as e:
             return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
+        order = Order.objects.select_related("user").prefetch_related(
+            Prefetch("items", queryset=OrderItem.objects.select_related("producto"))
+        ).get(pk=order.pk)
         response_serializer = self.get_serializer(order)
         return Response(response_serializer.data, status=status.HTTP_201_CREATED)
 
@@ -706,7 +898,7 @@ class OrderDetailView(generics.RetrieveAPIView):
     serializer_class = OrderSerializer
     permission_classes = [permissions.IsAuthenticated]
     def get_queryset(self):
-        return Order.objects.filter(user=self.request.user)
+        return ordenes_con_detalle(Order.objects.filter(user=self.request.user))
 
 class OrderUpdateView(generics.UpdateAPIView):
     serializer_class = OrderSerializer
@@ -731,13 +923,11 @@ class OrderDeleteView(generics.DestroyAPIView):
             raise PermissionDenied("Solo se pueden eliminar órdenes pendientes o canceladas.")
         instance.delete()
 
-class AdminOrderListView(generics.ListAPIView):
-    queryset = Order.objects.all().order_by("-created_at")
-    serializer_class = OrderSerializer
+class AdminOrderListView(OrderListMixin, generics.ListAPIView):
     permission_classes = [permissions.IsAdminUser]
 
 class AdminOrderDetailView(generics.RetrieveAPIView):
-    queryset = Order.objects.all()
+    queryset = ordenes_con_detalle(Order.objects.all())
     serializer_class = OrderSerializer
     permission_classes = [permissions.IsAdminUser]
 
@@ -750,43 +940,44 @@ class AdminOrderUpdateView(generics.UpdateAPIView):
         order = self.get_object()
         previous_status = order.status
         new_status = self.request.data.get("status", previous_status)
+        if new_status not in dict(Order.STATUS_CHOICES):
+            raise DRFValidationError({"status": f"Estado inválido: {new_status}."})
 
-        serializer.save(status=new_status)
-        updated_order = serializer.instance
+        with transaction.atomic():
+            # Cambio de estado condicional: si otro admin ya lo movió, no se repite el movimiento de stock.
+            if not Order.objects.filter(pk=order.pk, status=previous_status).update(status=new_status):
+                raise DRFValidationError({"detail": "La orden fue modificada por otro usuario. Recarga e intenta de nuevo."})
+            serializer.save(status=new_status)
+            updated_order = serializer.instance
 
-        order_items = getattr(updated_order, "items", None)
-        if order_items is None or not hasattr(order_items, "all"):
-            order_items = OrderItem.objects.filter(order=updated_order)
+            self.resultado_stock = []
+            if new_status in ["completed", "processing"] and previous_status not in ["completed", "processing"]:
+                # StockInsuficiente sale del atomic: se revierte también el cambio de estado.
+                self.resultado_stock = descontar_stock_orden(updated_order)
+            elif new_status in ["rejected", "cancelled"] and previous_status in ["processing", "completed"]:
+                self.resultado_stock = devolver_stock_orden(updated_order)
 
-        if new_status in ["completed", "processing"] and previous_status not in ["completed", "processing"]:
-            for item in order_items.all():
-                product = item.producto
-                if product.stock >= item.cantidad:
-                    product.stock -= item.cantidad
-                    product.save()
-                    print(f"🟢 Stock descontado: {product.nombre_producto} → {product.stock}")
-                else:
-                    print(f"⚠️ Stock insuficiente para {product.nombre_producto}")
+            ventas.mover_orden(updated_order, previous_status, new_status)
 
-        elif new_status in ["rejected", "cancelled"] and previous_status in ["processing", "completed"]:
-            for item in order_items.all():
-                product = item.producto
-                product.stock += item.cantidad
-                product.save()
-                print(f"🔁 Stock devuelto: {product.nombre_producto} → {product.stock}")
-
-        print(f"📦 Estado actualizado: {previous_status} → {new_status}")
+        logger.info("Orden %s: estado %s → %s", updated_order.code, previous_status, new_status)
 
     def update(self, request, *args, **kwargs):
         """
         Sobrescribimos el método update para devolver una respuesta más clara al frontend.
         """
-        response = super().update(request, *args, **kwargs)
+        try:
+            super().update(request, *args, **kwargs)
+        except StockInsuficiente as e:
+            return Response({
+                "detail": "Stock insuficiente; la orden no cambió de estado.",
+                "faltantes": e.faltantes,
+            }, status=status.HTTP_409_CONFLICT)
         order = self.get_object()
         return Response({
             "detail": f"Estado de la orden actualizado correctamente a '{order.status}'.",
             "order_id": order.id,
-            "new_status": order.status
+            "new_status": order.status,
+            "stock": getattr(self, "resultado_stock", []),
         }, status=status.HTTP_200_OK)
 
 class AdminOrderDeleteView(generics.DestroyAPIView):
@@ -795,15 +986,52 @@ class AdminOrderDeleteView(generics.DestroyAPIView):
     serializer_class = OrderSerializer
     permission_classes = [permissions.IsAdminUser]
 
-class MisPedidosView(generics.ListAPIView):
-    serializer_class = OrderSerializer
+class AdminVentasResumenView(APIView):
+    """
+    GET: Resumen de ventas desde las tablas de ``ventas.py``, sin recorrer Order.
+
+    Parámetros: ``desde``/``hasta`` (AAAA-MM-DD, inclusive; por defecto los
+    últimos 30 días), ``agrupar=dia|hora``, ``status=a,b`` y
+    ``por=producto|categoria`` para incluir un ranking de hasta ``limite`` filas.
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        params = request.query_params
+        agrupar = params.get("agrupar", "dia")
+        if agrupar not in ("dia", "hora"):
+            raise DRFValidationError({"agrupar": "Usa 'dia' u 'hora'."})
+        por = params.get("por", "")
+        if por not in ("", "producto", "categoria"):
+            raise DRFValidationError({"por": "Usa 'producto' o 'categoria'."})
+        try:
+            limite = max(1, min(int(params.get("limite", 20)), 100))
+        except ValueError:
+            raise DRFValidationError({"limite": "Debe ser un número."})
+
+        hasta = fecha_param(request, "hasta")
+        hasta = (hasta or timezone.make_aware(datetime.combine(timezone.localdate(), datetime.min.time()))) + timedelta(days=1)
+        desde = fecha_param(request, "desde") or hasta - timedelta(days=30)
+        estados = estados_param(request)
+
+        data = {
+            "desde": desde.date().isoformat(),
+            "hasta": (hasta - timedelta(days=1)).date().isoformat(),
+            "agrupar": agrupar,
+            **ventas.serie(desde, hasta, agrupar, estados, timezone.get_current_timezone()),
+        }
+        if por:
+            data["ranking"] = ventas.ranking(desde, hasta, por, estados, limite)
+        return Response(data)
+
+class MisPedidosView(OrderListMixin, generics.ListAPIView):
     permission_classes = [permissions.IsAuthenticated]
 
-    def get_queryset(self):
+    def get_ordenes(self):
         user = self.request.user
         if not user.is_authenticated:
             return Order.objects.none()
-        return Order.objects.filter(user=user).order_by("-created_at")
+        return Order.objects.filter(user=user)
 
 class PasswordResetValidateTokenView(APIView):
     def post(self, request):
@@ -848,6 +1076,7 @@ class PasswordResetConfirmView(APIView):
 
         user.set_password(password)
         user.save()
+        invalidar_tokens(user)
 
         return Response({"message": "✅ Contraseña restablecida correctamente."}, status=status.HTTP_200_OK)
     
@@ -866,13 +1095,8 @@ class RequestPasswordResetView(APIView):
         uidb64 = urlsafe_base64_encode(force_bytes(user.pk))
         reset_link = f"https://www.motorepuestodavila.com/reset-password?uid={uidb64}&token={token}"
 
-        send_mail(
-            "Recupera tu contraseña",
-            f"Hola {user.nombre} {user.apellidos or ''}, usa el siguiente enlace para restablecer tu contraseña: {reset_link}",
-            "no-reply@tuapp.com",
-            [email],
-            fail_silently=False,
-        )
+        nombre = f"{user.nombre} {user.apellidos or ''}".strip()
+        enviar_plantilla("recuperar_password", email, nombre=nombre, enlace=reset_link)
 
         return Response({"message": "Correo de recuperación enviado."}, status=status.HTTP_200_OK)
     
@@ -896,12 +1120,10 @@ class AdminBlockUserView(APIView):
             )
         is_active = request.data["is_active"]
         user.is_active = is_active
-        if not is_active:
-            user.blocked_until = None  
-        else:
-            user.failed_login_attempts = 0
-            user.blocked_until = None
-        user.save()
+        user.save(update_fields=["is_active"])
+        invalidar_tokens(user)
+        if is_active:
+            limites.desbloquear_email(user.email)
         action = "desbloqueado" if is_active else "bloqueado"
         return Response(
             {"message": f"El usuario {user.email} fue {action} correctamente."},